@@ -26,6 +26,9 @@ a = Analysis(
         'pyqtgraph.graphicsItems',
         'numpy',
         'sqlite3',
+        # Импортируются лениво, при первом открытии вкладки статистики
+        'controller.main_window_controllers.statistic_controller',
+        'model.statistics',
     ],
     hookspath=[],
     hooksconfig={},
@@ -1,7 +1,9 @@
 from .main_window_controllers import MainWindowController
 from .login_controller import LoginController
+from .db_worker import DatabaseWorker
 from model import Model
 from PyQt6.QtWidgets import QMessageBox, QApplication
+import startup_trace
 import traceback
 
 
@@ -14,11 +16,16 @@ class StartUpController:
     def __init__(self):
         # Создаём модель ОДИН РАЗ при запуске приложения
         self.model = Model()
+        startup_trace.mark("model")
+        # Фоновый поток для тяжёлых запросов к БД, живёт всё время работы приложения
+        self.db_worker = DatabaseWorker()
+        self.db_worker.start()
         self.login_window = None
         self.main_window = None
         
         # Создаём окно входа
         self._create_login_window()
+        startup_trace.mark("login_window")
 
     def _create_login_window(self):
         """Создаёт или пересоздаёт окно входа"""
@@ -39,9 +46,12 @@ class StartUpController:
             
             # Инициализируем пользователя в модели
             self.model.init_user(user_id)
+            startup_trace.mark("init_user")
             
             # Создаём главное окно
-            self.main_window = MainWindowController(model=self.model)
+            self.main_window = MainWindowController(model=self.model, db_worker=self.db_worker)
+            startup_trace.mark("main_window")
+            startup_trace.watch_first_paint(self.main_window, "main_window_painted")
             self.main_window.show()
             
             # Подключаем сигнал выхода
@@ -94,6 +104,10 @@ class StartUpController:
             if self.login_window:
                 self.login_window.close()
             
+            # Дожидаемся фоновых задач, пока БД ещё открыта
+            if self.db_worker:
+                self.db_worker.stop()
+
             # Закрываем модель и БД
             if self.model:
                 self.model.shutdown()
@@ -0,0 +1,86 @@
+from PyQt6.QtCore import QThread, pyqtSignal
+import queue
+import traceback
+
+
+class DatabaseWorker(QThread):
+    """
+    Фоновый поток для работы с БД, чтобы окно не зависало на SQLite.
+
+    Контроллеры отдают сюда функции модели через submit(), поток выполняет их
+    по очереди, а результат (или ошибка) возвращается в GUI-поток через сигналы
+    и попадает в колбэки on_done / on_error.
+    """
+
+    # Сигналы испускаются из фонового потока, а слоты выполняются в GUI-потоке,
+    # потому что сам объект QThread живёт в GUI-потоке
+    task_finished = pyqtSignal(int, object)
+    task_failed = pyqtSignal(int, object)
+    task_progress = pyqtSignal(int, int, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._tasks = queue.Queue()
+        self._callbacks = {}
+        self._next_task_id = 0
+
+        self.task_finished.connect(self._on_task_finished)
+        self.task_failed.connect(self._on_task_failed)
+        self.task_progress.connect(self._on_task_progress)
+
+    def submit(self, func, *args, on_done=None, on_error=None, on_progress=None, **kwargs):
+        """
+        Ставит func(*args, **kwargs) в очередь фонового потока.
+        on_done(result) и on_error(exception) вызываются в GUI-потоке.
+        Если передан on_progress(done, total), func получает аргумент progress_callback,
+        вызовы которого из фонового потока доходят до on_progress в GUI-потоке.
+        Возвращает номер задачи.
+        """
+        self._next_task_id += 1
+        task_id = self._next_task_id
+        self._callbacks[task_id] = (on_done, on_error, on_progress)
+        if on_progress:
+            kwargs["progress_callback"] = (
+                lambda done, total: self.task_progress.emit(task_id, done, total)
+            )
+        self._tasks.put((task_id, func, args, kwargs))
+        return task_id
+
+    def run(self):
+        """Цикл фонового потока: берём задачи из очереди, пока не придёт None"""
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+
+            task_id, func, args, kwargs = task
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                traceback.print_exc()
+                self.task_failed.emit(task_id, e)
+            else:
+                self.task_finished.emit(task_id, result)
+
+    def stop(self):
+        """Дожидается уже поставленных задач и останавливает поток"""
+        if self.isRunning():
+            self._tasks.put(None)
+            self.wait()
+
+    def _on_task_finished(self, task_id, result):
+        on_done, _, _ = self._callbacks.pop(task_id, (None, None, None))
+        if on_done:
+            on_done(result)
+
+    def _on_task_failed(self, task_id, error):
+        _, on_error, _ = self._callbacks.pop(task_id, (None, None, None))
+        if on_error:
+            on_error(error)
+        else:
+            print(f"Ошибка в фоновой задаче БД: {error}")
+
+    def _on_task_progress(self, task_id, done, total):
+        _, _, on_progress = self._callbacks.get(task_id, (None, None, None))
+        if on_progress:
+            on_progress(done, total)
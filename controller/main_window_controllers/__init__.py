@@ -1,28 +1,60 @@
 from view.main_window import Ui_MainWindow
 from .my_habbits_controller import MyHabitsController
-from .statistic_controller import StatisticController
 from .settings_controller import SettingsController
+from .rollover_scheduler import RolloverScheduler
 from PyQt6.QtWidgets import QMainWindow, QMessageBox
-from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtCore import pyqtSignal, QTimer
+import importlib
 
 
 class MainWindowController(QMainWindow, Ui_MainWindow):
     unlogin_from_main = pyqtSignal()
 
-    def __init__(self, model):
+    def __init__(self, model, db_worker):
         super().__init__()
         self.setupUi(self)
         # Создаем ссылку на наши модели и получаем их самих
         self.model = model
+        # Фоновый поток БД, через него контроллеры вкладок делают долгие запросы
+        self.db_worker = db_worker
         self.user_model = model.get_user()
         self.auth_model = model.get_auth()
-        # Инициализируем наши контроллеры для каждой вкладки
+        # Инициализируем наши контроллеры для каждой вкладки.
+        # Статистика (а с ней pyqtgraph и NumPy) создаётся при первом открытии вкладки,
+        # чтобы таблица привычек появлялась сразу после входа
         self.habit_controller = MyHabitsController(self, self.user_model)
-        self.statistic_controller = StatisticController(self, self.user_model)
+        self.statistic_controller = None
         self.settings_controller = SettingsController(self, self.auth_model, self.user_model)
+        # Переход на новый день в полночь, если окно не закрывали
+        self.rollover_scheduler = RolloverScheduler(self.user_model, self.db_worker, self)
+        self.rollover_scheduler.start()
         # Сигнал выхода из приложения
         self.connect_signal()
 
+        # Когда окно уже показано и пользователь ничего не делает - заранее импортируем
+        # тяжёлые модули статистики, чтобы первое открытие вкладки было быстрым
+        ui_config = model.config.get("ui", {})
+        if ui_config.get("prewarm_statistics", True):
+            QTimer.singleShot(int(ui_config.get("prewarm_delay_ms", 1500)), self.prewarm_statistics)
+
+    def get_statistic_controller(self):
+        """Создаёт контроллер статистики при первом обращении"""
+        if self.statistic_controller is None:
+            from .statistic_controller import StatisticController
+            self.statistic_controller = StatisticController(self, self.user_model)
+            # updater() на этом клике контроллер ещё не видел - загружаем график сами
+            self.statistic_controller.collect_data_and_call_graph()
+        return self.statistic_controller
+
+    def prewarm_statistics(self):
+        """Только импорт модулей: виджеты и запросы к БД остаются до открытия вкладки"""
+        if self.statistic_controller is None:
+            importlib.import_module(f"{__name__}.statistic_controller")
+
+    def on_tab_changed(self, index):
+        if self.tabWidget.widget(index) is self.tab_statistic:
+            self.get_statistic_controller()
+
     def closeEvent(self, event):
         """Обработчик закрытия главного окна"""
         reply = QMessageBox.question(
@@ -33,6 +65,7 @@ class MainWindowController(QMainWindow, Ui_MainWindow):
         )
         
         if reply == QMessageBox.StandardButton.Yes:
+            self.rollover_scheduler.stop()
             event.accept()
         else:
             event.ignore()
@@ -42,8 +75,12 @@ class MainWindowController(QMainWindow, Ui_MainWindow):
         self.tabWidget.tabBarClicked.connect(
             self.updater
         )
+        # Вкладка статистики собирается при первом переходе на неё
+        self.tabWidget.currentChanged.connect(self.on_tab_changed)
         # Подключаем сигнал выхода
         self.settings_controller.unlogin.connect(self.handle_unlogin)
+        # После перехода на новый день одним разом обновляем привычки и статистику
+        self.rollover_scheduler.day_changed.connect(self.updater)
 
     def handle_unlogin(self):
         """Вызывается при сигнале выхода из настроек"""
@@ -57,5 +94,7 @@ class MainWindowController(QMainWindow, Ui_MainWindow):
 
     def updater(self):
         # обновляем привычки и ТД, а то в друг беда будет
-        self.statistic_controller.update_habits()
+        # (статистику - только если вкладку уже открывали, иначе она загрузится при создании)
+        if self.statistic_controller is not None:
+            self.statistic_controller.update_habits()
         self.habit_controller.show_habits()
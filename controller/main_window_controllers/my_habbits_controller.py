@@ -1,10 +1,130 @@
 from view.add_dialog import AddHabitDialog
 from PyQt6.QtWidgets import QMessageBox, QAbstractItemView, QHeaderView
-from PyQt6.QtGui import QStandardItemModel, QStandardItem
 # QRegularExpression вроде не используется, но решил оставить так как в Qt документации, это штучка нужна для сортировки QproxyFilterModel
 # это я так понял, в теории онва правда может и не нужна, но лучше оставить чтобы избежать багов в будущем
-from PyQt6.QtCore import QSortFilterProxyModel, Qt, QRegularExpression
+from PyQt6.QtCore import QSortFilterProxyModel, QAbstractTableModel, QModelIndex, Qt, QRegularExpression
 from sqlite3 import IntegrityError
+from operator import attrgetter
+
+
+class HabitRow:
+    """Одна строка таблицы привычек. __slots__ - чтобы десятки тысяч строк не держали по словарю"""
+    __slots__ = ("name", "category", "daily_frequency", "created_at",
+                 "progress", "target", "streak", "best_streak")
+
+    def __init__(self, habit):
+        # habit - строка SELECT_HABITS_WITH_TODAY_PROGRESS
+        self.name = habit["name"]
+        self.category = habit["category"]
+        self.daily_frequency = habit["daily_frequency"]
+        self.created_at = habit["created_at"]
+        self.progress = habit["progress"]
+        self.target = habit["target"]
+        self.streak = habit["streak"]
+        self.best_streak = habit["best_streak"]
+
+    def text(self, column):
+        """Текст ячейки: строки формируются только для видимых ячеек, когда их просит таблица"""
+        if column == 0:
+            return self.name
+        if column == 1:
+            return self.category
+        if column == 2:
+            return str(self.daily_frequency)
+        if column == 3:
+            return self.created_at
+        if column == 4:
+            return f"{self.progress}/{self.target}" if self.progress < self.target else "✅"
+        if column == 5:
+            # Серии приходят тем же запросом из habit_streaks
+            return f"🔥 {self.streak}" if self.streak else "0"
+        return str(self.best_streak)
+
+
+# Все поля строки одним кортежем - для сравнения старой и новой версии строки
+habit_row_values = attrgetter(*HabitRow.__slots__)
+
+
+class HabitsTableModel(QAbstractTableModel):
+    """
+    Модель таблицы привычек. Хранит HabitRow, а не QStandardItem на каждую ячейку:
+    при обновлении сообщает таблице только об изменившихся строках (dataChanged),
+    и та перерисовывает их, не пересоздавая всю модель.
+    """
+    HEADERS = ["Название", "Категория", "Частота", "Дата", "Выполнено", "Серия", "Рекорд"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        # Имя привычки -> номер строки, чтобы обновить одну строку после отметки
+        self._row_by_name = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        return self._rows[index.row()].text(index.column())
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def habit_at(self, row):
+        return self._rows[row]
+
+    def set_habits(self, habits):
+        """
+        Заменяет содержимое таблицы. Если набор привычек тот же (обычный случай:
+        смена дня, импорт без новых привычек), меняются только отличающиеся строки
+        """
+        rows = [HabitRow(habit) for habit in habits]
+        if [row.name for row in rows] != [row.name for row in self._rows]:
+            self.beginResetModel()
+            self._rows = rows
+            self._reindex()
+            self.endResetModel()
+            return
+
+        old_rows, self._rows = self._rows, rows
+        changed = [
+            i for i, (old, new) in enumerate(zip(old_rows, rows))
+            if habit_row_values(old) != habit_row_values(new)
+        ]
+        # Соседние изменившиеся строки - одним сигналом
+        start = None
+        for position, row in enumerate(changed):
+            if start is None:
+                start = row
+            if position + 1 == len(changed) or changed[position + 1] != row + 1:
+                self._emit_rows_changed(start, row)
+                start = None
+
+    def update_habit(self, habit):
+        """Обновляет одну строку. False, если такой привычки в таблице нет"""
+        row = self._row_by_name.get(habit["name"])
+        if row is None:
+            return False
+        self._rows[row] = HabitRow(habit)
+        self._emit_rows_changed(row, row)
+        return True
+
+    def remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        self._reindex()
+        self.endRemoveRows()
+
+    def _reindex(self):
+        self._row_by_name = {habit.name: row for row, habit in enumerate(self._rows)}
+
+    def _emit_rows_changed(self, first, last):
+        self.dataChanged.emit(self.index(first, 0), self.index(last, len(self.HEADERS) - 1))
 
 
 class CustomFilterProxyModel(QSortFilterProxyModel):
@@ -26,14 +146,10 @@ class CustomFilterProxyModel(QSortFilterProxyModel):
 
     def filterAcceptsRow(self, source_row, source_parent):
         """Переопределенный метод для фильтрации по обоим критериям"""
-        model = self.sourceModel()
-        
-        # Получаем данные из нужных столбцов
-        name_index = model.index(source_row, 0, source_parent)
-        category_index = model.index(source_row, 1, source_parent)
-        
-        name = model.data(name_index, Qt.ItemDataRole.DisplayRole)
-        category = model.data(category_index, Qt.ItemDataRole.DisplayRole)
+        # Берём название и категорию прямо из строки модели, без QModelIndex и data()
+        habit = self.sourceModel().habit_at(source_row)
+        name = habit.name
+        category = habit.category
         
         # Проверяем фильтр по названию
         name_match = True
@@ -55,7 +171,7 @@ class MyHabitsController:
         self.window = window
         self.model = model
         # Ставим модели для работы с таблицей
-        self.table_model = QStandardItemModel()
+        self.table_model = HabitsTableModel()
         # Используем кастомную модель
         self.proxy_model = CustomFilterProxyModel()  
 
@@ -76,6 +192,17 @@ class MyHabitsController:
         self.window.HabitsTable.setModel(self.proxy_model)
         self._make_some_changes_to_HabitsTable()
 
+        # Название растягиваем, остальные колонки подгоняем по содержимому в _fit_table_to_contents.
+        # Не ResizeToContents: он перемеряет колонки на каждый dataChanged, а это тысячи строк
+        header = self.window.HabitsTable.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        for i in range(1, self.table_model.columnCount()):
+            header.setSectionResizeMode(i, QHeaderView.ResizeMode.Interactive)
+
+        # Высота строк фиксированная, по той же причине
+        self.window.HabitsTable.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.table_model.modelReset.connect(self._fit_table_to_contents)
+
     def add_btn(self):
         dialog = AddHabitDialog(self.window)
         if dialog.exec():
@@ -104,9 +231,9 @@ class MyHabitsController:
         source_index = self.proxy_model.mapToSource(current_index)
         row = source_index.row()
 
-        habit_name = self.table_model.item(row, 0).text()
+        habit_name = self.table_model.habit_at(row).name
         self.model.remove_habit(habit_name)
-        self.table_model.removeRow(row)
+        self.table_model.remove_row(row)
 
     def mark_btn(self):
         current_index = self.window.HabitsTable.currentIndex()
@@ -118,15 +245,41 @@ class MyHabitsController:
         source_index = self.proxy_model.mapToSource(current_index)
 
         row = source_index.row()
-        habit_name = self.table_model.item(row, 0).text()
+        habit_name = self.table_model.habit_at(row).name
+        # Запись в БД идёт в фоновом потоке, таблицу обновим по готовности
+        self.window.db_worker.submit(
+            self._mark_habit, habit_name,
+            on_done=self._on_habit_marked,
+            on_error=self._on_db_error
+        )
+
+    def _mark_habit(self, habit_name):
+        """
+        Выполняется в фоновом потоке. Возвращает (имя, отмечена ли, выполнена ли цель теперь,
+        обновлённая строка для таблицы). Отметки нет, если привычка уже выполнена сегодня
+        """
         if self.model.is_habit_completed_today(habit_name):
-            QMessageBox.warning(self.window, "Информация", "Эта привычка уже выполнена сегодня.")
-            return
+            return habit_name, False, True, None
         # Меняем отметку в БД
         self.model.toggle_mark_habit(habit_name)
+        completed = self.model.is_habit_completed_today(habit_name)
+        return habit_name, True, completed, self.model.get_habit_with_progress(habit_name)
 
-        # Обновляем отображение
-        self.show_habits()
+    def _on_habit_marked(self, result):
+        habit_name, marked, completed, habit = result
+        if not marked:
+            QMessageBox.warning(self.window, "Информация", "Эта привычка уже выполнена сегодня.")
+            return
+        # Обновляем только строку отмеченной привычки (если её вдруг нет - всю таблицу)
+        if habit is None or not self.table_model.update_habit(habit):
+            self.show_habits()
+        # Тепловая карта на вкладке статистики меняет только сегодняшнюю ячейку
+        # (если вкладку ещё не открывали, карта потом загрузится уже с отметкой)
+        if self.window.statistic_controller is not None:
+            self.window.statistic_controller.on_habit_marked(habit_name, completed)
+
+    def _on_db_error(self, error):
+        QMessageBox.critical(self.window, "Ошибка", f"Не удалось сохранить отметку:\n{error}")
 
     def remove_filter(self):
         """Сбрасывает все фильтры"""
@@ -137,36 +290,24 @@ class MyHabitsController:
         self.proxy_model.set_category_filter("")
 
     def show_habits(self):
-        habits = self.model.get_habits()
-
-        self.table_model.clear()
-        self.table_model.setHorizontalHeaderLabels(["Название", "Категория", "Частота", "Дата", "Выполнено"])
-
-        for habit in habits:
-            progress, target = self.model.get_progress_and_target(habit["name"])
-            row = [
-                QStandardItem(habit["name"]),
-                QStandardItem(habit["category"]),
-                QStandardItem(str(habit["daily_frequency"])),
-                QStandardItem(habit["created_at"]),
-                QStandardItem(f"{progress}/{target}" if progress < target else f"✅")
-            ]
-
-            self.table_model.appendRow(row)
-
-        # Растягиваем колонки для наилучшего вида
-        header = self.window.HabitsTable.horizontalHeader()
-        header.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
-        for i in range(1, self.table_model.columnCount()):
-            header.setSectionResizeMode(i, QHeaderView.ResizeMode.ResizeToContents)
-        
-        # Растягиваем строки по вертикали для лучшего отображения, иначе из-за qss стиля цифры будут 'зажованы'
-        vertical_header = self.window.HabitsTable.verticalHeader()
-        vertical_header.setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        # Привычки сразу с прогрессом за сегодня, без отдельного запроса на каждую строку
+        habits = self.model.get_habits_with_progress()
+        # Если набор привычек не изменился, таблица перерисует только изменившиеся строки
+        self.table_model.set_habits(habits)
 
         # Обновляем категории для FilterBox
         self.update_categories()
 
+    def _fit_table_to_contents(self):
+        """Подгоняет ширину колонок и высоту строк после полной замены данных таблицы"""
+        table = self.window.HabitsTable
+        for i in range(1, self.table_model.columnCount()):
+            table.resizeColumnToContents(i)
+        # Высоту строки берём по первой строке (с учётом qss), иначе из-за стиля цифры будут 'зажованы'.
+        # Строки одинаковые, поэтому мерить все не нужно
+        if self.table_model.rowCount():
+            table.verticalHeader().setDefaultSectionSize(table.sizeHintForRow(0))
+
     def get_search_filter(self):
         """Применяет фильтр поиска по названию привычки"""
         text = self.window.SearchInput.text()
@@ -191,10 +332,11 @@ class MyHabitsController:
         source_index = self.proxy_model.mapToSource(index)
         row = source_index.row()
         
-        habit_name = self.table_model.item(row, 0).text()
-        category = self.table_model.item(row, 1).text()
-        frequency = self.table_model.item(row, 2).text()
-        marked = self.table_model.item(row, 4).text()
+        habit = self.table_model.habit_at(row)
+        habit_name = habit.name
+        category = habit.category
+        frequency = habit.text(2)
+        marked = habit.text(4)
         
         QMessageBox.information(
             self.window,
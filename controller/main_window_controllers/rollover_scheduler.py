@@ -0,0 +1,78 @@
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from datetime import date, datetime, time, timedelta
+
+
+class RolloverScheduler(QObject):
+    """
+    Переход на новый день, пока окно открыто.
+
+    Одноразовый таймер заводится на ближайшую локальную полночь, а раз в минуту
+    дата сверяется ещё раз: после сна компьютера или перевода часов таймер
+    может сработать не вовремя. Сам сброс идёт в фоновом потоке БД,
+    а по его окончании один раз испускается day_changed.
+    """
+    day_changed = pyqtSignal()
+
+    # Проверка даты на случай сна/перевода часов
+    CHECK_INTERVAL_MS = 60 * 1000
+    # Небольшой запас, чтобы таймер не сработал за мгновение до полуночи
+    MIDNIGHT_MARGIN_MS = 1000
+
+    def __init__(self, model, db_worker, parent=None):
+        super().__init__(parent)
+        self.model = model
+        self.db_worker = db_worker
+        self.current_day = date.today()
+        self._rollover_running = False
+
+        self.midnight_timer = QTimer(self)
+        self.midnight_timer.setSingleShot(True)
+        self.midnight_timer.timeout.connect(self.check_day)
+
+        self.watchdog_timer = QTimer(self)
+        self.watchdog_timer.setInterval(self.CHECK_INTERVAL_MS)
+        self.watchdog_timer.timeout.connect(self.check_day)
+
+    def start(self):
+        self._arm_midnight_timer()
+        self.watchdog_timer.start()
+
+    def stop(self):
+        self.midnight_timer.stop()
+        self.watchdog_timer.stop()
+
+    def _arm_midnight_timer(self):
+        """Заводит таймер на ближайшую локальную полночь"""
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), time.min)
+        msecs = int((midnight - now).total_seconds() * 1000) + self.MIDNIGHT_MARGIN_MS
+        self.midnight_timer.start(msecs)
+
+    def check_day(self):
+        """Если дата сменилась — запускает переход на новый день в фоновом потоке"""
+        today = date.today()
+        if today == self.current_day or self._rollover_running:
+            # Таймер мог сработать раньше (часы перевели назад) — просто перезаводим
+            self._arm_midnight_timer()
+            return
+
+        self._rollover_running = True
+        self.db_worker.submit(
+            self.model.rollover_if_new_day,
+            on_done=lambda _: self._on_rollover_done(today),
+            on_error=self._on_rollover_failed
+        )
+
+    def _on_rollover_done(self, today):
+        self._rollover_running = False
+        self.current_day = today
+        self._arm_midnight_timer()
+        # Обновляем вкладки даже если сброс уже сделали при входе в другом окне:
+        # в таблице всё равно вчерашние данные
+        self.day_changed.emit()
+
+    def _on_rollover_failed(self, error):
+        self._rollover_running = False
+        print(f"Не удалось выполнить переход на новый день: {error}")
+        # Попробуем ещё раз при следующей проверке
+        self._arm_midnight_timer()
@@ -1,5 +1,5 @@
-from PyQt6.QtWidgets import QMessageBox, QLineEdit, QFileDialog
-from PyQt6.QtCore import pyqtSignal, QObject
+from PyQt6.QtWidgets import QMessageBox, QLineEdit, QFileDialog, QProgressDialog
+from PyQt6.QtCore import pyqtSignal, QObject, Qt
 import os
 
 
@@ -12,6 +12,8 @@ class SettingsController(QObject):
         self.window = window
         self.auth_model = model
         self.user_model = user_model
+        # Окно с прогрессом импорта, создаётся на время импорта
+        self.import_progress = None
         self.init_ui()
 
     def init_ui(self):
@@ -143,59 +145,112 @@ class SettingsController(QObject):
 
     def import_btn(self):
         """Функция для импорта привычек из JSON файла"""
-        try:
-            # Получаем путь json массива с привычками
-            file_path = QFileDialog.getOpenFileName(
-                self.window, 
-                "Выберите файл для импорта",
-                "",
-                "JSON Files (*.json)"
-            )[0]
-            
-            # Если пользователь отменил выбор файла
-            if not file_path:
-                return
-            
-            # Импортируем привычки
-            imported, skipped = self.user_model.import_habits(file_path)
-            
-            # Формируем сообщение о результатах
-            message = f"Импорт завершен!\n\n"
-            message += f"✅ Импортировано: {imported}\n"
-            
-            if skipped > 0:
-                message += f"⚠️ Пропущено (дубликаты): {skipped}"
-            
-            QMessageBox.information(self.window, "Успешно", message)
-            
-            # Обновляем отображение привычек
-            if hasattr(self.window, 'habit_controller'):
-                self.window.habit_controller.show_habits()
+        # Получаем путь json массива с привычками
+        file_path = QFileDialog.getOpenFileName(
+            self.window, 
+            "Выберите файл для импорта",
+            "",
+            "JSON Files (*.json *.jsonl *.json.gz *.jsonl.gz)"
+        )[0]
+        
+        # Если пользователь отменил выбор файла
+        if not file_path:
+            return
+
+        # Прогресс в процентах от прочитанной части файла
+        self.import_progress = QProgressDialog("Импорт привычек...", None, 0, 100, self.window)
+        self.import_progress.setWindowTitle("Импорт")
+        self.import_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.import_progress.setMinimumDuration(300)
+        self.import_progress.setValue(0)
+
+        # Импортируем привычки в фоновом потоке, чтобы окно не зависало на больших файлах
+        self.window.ImportProfileBtn.setEnabled(False)
+        self.window.db_worker.submit(
+            self.user_model.import_habits, file_path,
+            on_done=self._on_import_finished,
+            on_error=self._on_import_failed,
+            on_progress=self._on_import_progress
+        )
+
+    def _on_import_progress(self, done, total):
+        if self.import_progress and total:
+            self.import_progress.setValue(int(done * 100 / total))
+
+    def _close_import_progress(self):
+        self.window.ImportProfileBtn.setEnabled(True)
+        if self.import_progress:
+            self.import_progress.close()
+            self.import_progress = None
 
-        except FileNotFoundError:
+    def _on_import_finished(self, result):
+        self._close_import_progress()
+        imported, skipped = result
+        
+        # Формируем сообщение о результатах
+        message = f"Импорт завершен!\n\n"
+        message += f"✅ Импортировано: {imported}\n"
+        
+        if skipped > 0:
+            message += f"⚠️ Пропущено (дубликаты): {skipped}"
+        
+        QMessageBox.information(self.window, "Успешно", message)
+        
+        # Обновляем отображение привычек
+        if hasattr(self.window, 'habit_controller'):
+            self.window.habit_controller.show_habits()
+
+    def _on_import_failed(self, error):
+        self._close_import_progress()
+
+        if isinstance(error, FileNotFoundError):
             QMessageBox.warning(self.window, "Ошибка", "Файл не найден")
         
-        except ValueError as e:
-            QMessageBox.warning(self.window, "Ошибка", str(e))
+        elif isinstance(error, ValueError):
+            QMessageBox.warning(self.window, "Ошибка", str(error))
         
-        except Exception as e:
+        else:
             QMessageBox.critical(
                 self.window, 
                 "Ошибка", 
-                f"Произошла ошибка при импорте:\n{e}"
+                f"Произошла ошибка при импорте:\n{error}"
             )
 
+    # Форматы экспорта: фильтр диалога -> расширение файла
+    EXPORT_FILTERS = {
+        "JSON Files (*.json)": ".json",
+        "JSON Lines с историей (*.jsonl)": ".jsonl",
+        "CSV с историей (*.csv)": ".csv",
+        "JSON Lines с историей, gzip (*.jsonl.gz)": ".jsonl.gz",
+        "CSV с историей, gzip (*.csv.gz)": ".csv.gz",
+    }
+
     def export_btn(self):
-        """Функция для экспорта привычек в JSON файл"""
-        try:
-            # Получаем путь json массива с привычками, тк .getSaveFileName вернет корртеж где первый элемент — путь то берем только его 
-            file_path = QFileDialog.getSaveFileName(self.window, filter="JSON Files (*.json)")[0]
-            # А теперь модели даем наш путь чтобы она все сделала
-            self.user_model.export_habits(file_path)
+        """Функция для экспорта привычек в JSON/JSONL/CSV файл"""
+        # .getSaveFileName вернет кортеж (путь, выбранный фильтр)
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self.window, filter=";;".join(self.EXPORT_FILTERS)
+        )
+        if not file_path:
+            return
 
-        except Exception as e:
-            QMessageBox.warning(self.window, "Ошибка", f"Произошла ошибка: {e}")
+        # Не на всех платформах диалог сам дописывает расширение, а формат выбирается по нему
+        extension = self.EXPORT_FILTERS.get(selected_filter, ".json")
+        if not file_path.lower().endswith(tuple(self.EXPORT_FILTERS.values())):
+            file_path += extension
 
-        else:
-            QMessageBox.information(self.window, "Успешно", "Привычки успешно экспортированы.")
+        # А теперь модели даем наш путь чтобы она все сделала (в фоновом потоке)
+        self.window.ExportProfileBtn.setEnabled(False)
+        self.window.db_worker.submit(
+            self.user_model.export_habits, file_path,
+            on_done=self._on_export_finished,
+            on_error=self._on_export_failed
+        )
+
+    def _on_export_finished(self, _):
+        self.window.ExportProfileBtn.setEnabled(True)
+        QMessageBox.information(self.window, "Успешно", "Привычки успешно экспортированы.")
 
+    def _on_export_failed(self, error):
+        self.window.ExportProfileBtn.setEnabled(True)
+        QMessageBox.warning(self.window, "Ошибка", f"Произошла ошибка: {error}")
@@ -1,22 +1,107 @@
 import pyqtgraph as pg
-from PyQt6.QtWidgets import QVBoxLayout
+from PyQt6.QtWidgets import QVBoxLayout, QCheckBox
 from PyQt6.QtCore import Qt
-from datetime import datetime, date
+from datetime import date
+from view.range_dialog import DateRangeDialog
+from model.statistics import build_chart, build_heatmap, heatmap_cell, WEEKDAY_NAMES
+
+
+class ThinnedLabelAxis(pg.AxisItem):
+    """
+    Нижняя ось с подписями периодов. Показывает не все подписи, а каждую k-ю,
+    так чтобы они не налезали друг на друга при текущей ширине и масштабе графика
+    """
+
+    # Минимальное расстояние между подписями в пикселях
+    MIN_LABEL_SPACING = 80
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._labels = []
+
+    def set_labels(self, labels):
+        """Подпись i стоит под столбиком с x = i"""
+        self._labels = labels
+        self.picture = None
+        self.update()
+
+    def tickValues(self, minVal, maxVal, size):
+        first = max(int(minVal + 0.5), 0)
+        last = min(int(maxVal), len(self._labels) - 1)
+        if last < first:
+            return []
+        max_labels = max(int(size // self.MIN_LABEL_SPACING), 1)
+        step = -(-(last - first + 1) // max_labels)
+        # Шаг кратный step от нуля, чтобы при прокрутке подписи не прыгали
+        start = -(-first // step) * step
+        return [(step, list(range(start, last + 1, step)))]
+
+    def tickStrings(self, values, scale, spacing):
+        return [self._labels[int(value)] if 0 <= int(value) < len(self._labels) else "" for value in values]
 
 
 class StatisticController:
     """Контроллер отвечающий за работу с вкладкой статистики"""
+
+    # Пункты TimeBox: (текст, данные). None - за сегодня по часам,
+    # число - последние N дней, "custom" - период из DateRangeDialog
+    TIME_RANGES = [
+        ("За сегодня", None),
+        ("за 7 дней", 7),
+        ("за 30 дней", 30),
+        ("за 90 дней", 90),
+        ("за год", 365),
+        ("за 5 лет", 5 * 365),
+        ("Свой период...", "custom"),
+    ]
+
+    # Сколько недель тепловой карты видно сразу, остальное - прокруткой
+    HEATMAP_VISIBLE_WEEKS = 53
+    # Ключ тепловой карты для режима "все привычки вместе"
+    ALL_HABITS = "*"
+
     def __init__(self, window, model):
         self.window = window
         self.model = model
+        # Номер последнего запроса данных: ответы на устаревшие запросы не рисуем
+        self._request_id = 0
+        # Последний выбранный свой период (date, date)
+        self._custom_range = None
+        # Тепловая карта: для какой привычки построена (или ALL_HABITS) и её данные
+        self._heatmap_key = None
+        self._heatmap = None
 
         # Настраиваем layout для графика
         self.layout = QVBoxLayout(self.window.GraphWidget)
 
-        # Создаём сам график
-        self.graph_widget = pg.PlotWidget()
+        # Создаём сам график. Элементы создаются один раз и дальше только обновляются
+        self.date_axis = ThinnedLabelAxis(orientation='bottom')
+        self.graph_widget = pg.PlotWidget(axisItems={'bottom': self.date_axis})
         self.graph_widget.setBackground('w')
-        self.layout.addWidget(self.graph_widget)
+        self.layout.addWidget(self.graph_widget, 3)
+        self.bar_item = pg.BarGraphItem(x=[0], height=[0], width=0.6, brush='g')
+        self.graph_widget.addItem(self.bar_item)
+        # Скользящее среднее поверх столбиков
+        self.rolling_item = self.graph_widget.plot([], [], pen=pg.mkPen('b', width=2))
+        self.graph_widget.setYRange(-0.5, 1.5)
+        self.graph_widget.showGrid(x=True, y=True)
+        # Что нарисовано сейчас: одинаковые данные не перерисовываем
+        self._chart_key = None
+        self._axis_labels = None
+        self._title = None
+
+        # Тепловая карта выполнения: одна картинка, столбец - неделя, строка - день недели
+        self.heatmap_all_box = QCheckBox("Тепловая карта по всем привычкам")
+        self.layout.addWidget(self.heatmap_all_box)
+        self.heatmap_widget = pg.PlotWidget()
+        self.heatmap_widget.setBackground('w')
+        self.heatmap_item = pg.ImageItem()
+        self.heatmap_item.setLookupTable(
+            pg.ColorMap([0.0, 1.0], [(235, 237, 240), (33, 110, 57)]).getLookupTable(nPts=256)
+        )
+        self.heatmap_widget.addItem(self.heatmap_item)
+        self._setup_heatmap_view()
+        self.layout.addWidget(self.heatmap_widget, 1)
 
         # Если есть layout для статистики — вставляем туда
         if hasattr(self.window, "statisticLayout"):
@@ -34,12 +119,27 @@ class StatisticController:
         self.window.HabitBox.currentIndexChanged.connect(self.collect_data_and_call_graph)
         # При смене диапазона времени — автоматически обновляем график
         self.window.TimeBox.currentIndexChanged.connect(self.collect_data_and_call_graph)
+        # activated приходит и при повторном выборе того же пункта - так свой период можно поменять
+        self.window.TimeBox.activated.connect(self.on_time_box_activated)
         # Кнопка "Обновить" тоже оставляем на случай
         self.window.UpdateGraphBtn.clicked.connect(self.collect_data_and_call_graph)
+        self.heatmap_all_box.toggled.connect(self.collect_data_and_call_graph)
+
+    def _setup_heatmap_view(self):
+        """Оси тепловой карты: понедельник сверху, прокрутка только по горизонтали"""
+        plot = self.heatmap_widget.getPlotItem()
+        plot.invertY(True)
+        plot.hideButtons()
+        plot.setMenuEnabled(False)
+        plot.setMouseEnabled(x=True, y=False)
+        plot.getAxis('left').setTicks([[(row + 0.5, name) for row, name in enumerate(WEEKDAY_NAMES)]])
+        plot.setYRange(0, 7, padding=0)
 
     def update_habits(self):
         """Заполняет выпадающий список привычек"""
         print("Обновлен")
+        # Набор привычек мог измениться - тепловую карту перестроим при следующей загрузке
+        self._heatmap_key = None
         self.window.HabitBox.clear()  # очищаем, чтобы не дублировать
         habits = [habit["name"] for habit in self.model.get_habits()]
         if habits:
@@ -49,78 +149,183 @@ class StatisticController:
             self.window.HabitBox.addItem("Нет привычек")
 
     def init_text_time_box(self):
-        self.window.TimeBox.addItems(["За сегодня", "за 7 дней", "за 30 дней"])
+        for text, data in self.TIME_RANGES:
+            self.window.TimeBox.addItem(text, data)
         self.window.TimeBox.setCurrentIndex(0)
 
+    def on_time_box_activated(self, index):
+        """Для пункта "Свой период..." спрашивает даты и перестраивает график"""
+        if self.window.TimeBox.itemData(index) != "custom":
+            return
+
+        start, end = self._custom_range or (None, None)
+        dialog = DateRangeDialog(self.window, start, end)
+        if dialog.exec():
+            self._custom_range = dialog.get_range()
+            self.collect_data_and_call_graph()
+        elif self._custom_range is None:
+            # Период так и не выбран - возвращаемся к графику за сегодня
+            self.window.TimeBox.setCurrentIndex(0)
+
         # --- ОТОБРАЖЕНИЕ ГРАФИКА ---
 
-    def plot_habit_progress(self, habit_data, is_statistic_daily=False):
-        """Строит график прогресса привычки."""
-        self.graph_widget.clear()
+    def plot_habit_progress(self, chart, streak=None, history=None):
+        """
+        Строит график прогресса привычки из подготовленных массивов (см. model/statistics.py).
+        Детализация chart["granularity"]: "hour" - отметки за сегодня, "day" - выполнено (1) по дням,
+        "week" / "month" - доля дней с выполненной целью за период.
+        streak - (текущая серия, рекорд), history - итоги за всю историю, оба для заголовка.
+        """
+        self._set_title(self._chart_title(chart, streak, history))
 
-        dates = []
-        completed = []
-        if habit_data is None:
+        # Те же данные, что уже на графике (например, вернулись к прежней привычке) - ничего не трогаем
+        key = (chart["granularity"], chart["heights"].tobytes(), tuple(chart["labels"]))
+        if key == self._chart_key:
             return
-        for item in habit_data:
-            # Безопасная распаковка
-            if isinstance(item, (tuple, list)) and len(item) == 2:
-                d, c = item
-            else:
-                # Пропускаем любые некорректные записи
-                continue
-
-            # Фильтруем нули
-            if c <= 0:
-                continue
-
-            # Преобразуем дату
-            try:
-                if " " in d:
-                    dt = datetime.strptime(d, "%Y-%m-%d %H:%M:%S")
-                else:
-                    dt = datetime.strptime(d, "%Y-%m-%d")
-            except ValueError:
-                continue
-
-            # Форматируем дату для графика
-            if is_statistic_daily:
-                dates.append(dt.strftime("%H:%M:%S"))
-            else:
-                dates.append(dt.strftime("%d.%m.%Y"))
-
-            completed.append(c)
-
-        # Если после фильтрации нет данных — график не строим
-        if not dates:
+        self._chart_key = key
+
+        # Если данных нет — прячем столбики
+        has_data = chart["heights"].size > 0
+        self.bar_item.setVisible(has_data)
+        if not has_data:
+            self.rolling_item.setData([], [])
+            self.date_axis.set_labels([])
             return
 
-        x = list(range(len(dates)))
+        x = chart["x"]
+        self.bar_item.setOpts(x=x, height=chart["heights"])
+        if chart["rolling"] is not None:
+            self.rolling_item.setData(x, chart["rolling"])
+        else:
+            self.rolling_item.setData([], [])
+        self.date_axis.set_labels(chart["labels"])
+        self.graph_widget.setXRange(-0.5, x.size - 0.5)
+        self._set_axis_labels(chart["granularity"])
 
-        bg = pg.BarGraphItem(x=x, height=completed, width=0.6, brush='g')
-        self.graph_widget.addItem(bg)
+    def _set_axis_labels(self, granularity):
+        """Подписи осей меняются только вместе с видом графика"""
+        if granularity in ("week", "month"):
+            labels = ('Доля дней с выполненной целью', 'Неделя' if granularity == "week" else 'Месяц')
+        else:
+            labels = ('Выполнено (1) / Не выполнено (0)', 'Дата')
+        if labels == self._axis_labels:
+            return
+        self._axis_labels = labels
+        self.graph_widget.setLabel('left', labels[0])
+        self.graph_widget.setLabel('bottom', labels[1])
 
-        ax = self.graph_widget.getAxis('bottom')
-        # zip использую чтобы, удобнее было ставить данные
-        ax.setTicks([list(zip(x, dates))])
+    def _set_title(self, title):
+        if title != self._title:
+            self._title = title
+            self.graph_widget.setTitle(title)
 
-        self.graph_widget.setYRange(-0.5, 1.5)
-        self.graph_widget.setLabel('left', 'Выполнено (1) / Не выполнено (0)')
-        self.graph_widget.setLabel('bottom', 'Дата')
-        self.graph_widget.setTitle("Статистика привычки")
-        self.graph_widget.showGrid(x=True, y=True)
+    def _chart_title(self, chart, streak, history=None):
+        title = "Статистика привычки"
+        if streak:
+            title += f" — серия: {streak[0]} дн., рекорд: {streak[1]} дн."
+
+        details = []
+        if chart["granularity"] != "hour" and chart["heights"].size:
+            details.append(f"выполнено {chart['rate']:.0%}")
+            if chart["trend"]:
+                details.append("тренд ↑" if chart["trend"] > 0 else "тренд ↓")
+        if history:
+            details.append(f"за всё время {history['rate']:.0%}")
+        # Лучший день недели - за период графика, если он подневной, иначе за всю историю
+        if chart["weekdays"] is not None:
+            best_day = int(chart["weekdays"].argmax())
+            details.append(f"лучший день: {WEEKDAY_NAMES[best_day]}")
+        elif history and any(history["weekdays"]):
+            best_day = history["weekdays"].index(max(history["weekdays"]))
+            details.append(f"лучший день: {WEEKDAY_NAMES[best_day]}")
+        if not details:
+            return title
+        return f"{title}<br>{', '.join(details)}"
 
     def collect_data_and_call_graph(self):
-        """Собирает данные и дает их графу"""
+        """Собирает данные в фоновом потоке и дает их графу"""
         habit_name = self.window.HabitBox.currentText()
-        # Самый простой спрособ при отображении графика за недели убрать нули, a также показывать ежедневный прогресс в часах и минутах
-        is_stiic_daily = False
-        if self.window.TimeBox.currentIndex() == 0:
-            habit_data = self.model.get_habit_static_daily(habit_name)
-            is_stiic_daily = True
+        period = self.window.TimeBox.currentData()
+        if period == "custom":
+            # Даты спросит on_time_box_activated, без них строить нечего
+            if self._custom_range is None:
+                return
+            period = self._custom_range
+
+        # Тепловая карта не зависит от периода: грузим её, только если сменилась привычка
+        heatmap_key = self.ALL_HABITS if self.heatmap_all_box.isChecked() else habit_name
+        if heatmap_key == self._heatmap_key:
+            heatmap_key = None
+
+        self._request_id += 1
+        request_id = self._request_id
+        self.window.db_worker.submit(
+            self._load_habit_data, habit_name, period, heatmap_key,
+            on_done=lambda result: self._on_data_loaded(request_id, result)
+        )
+
+    def _load_habit_data(self, habit_name, period, heatmap_key=None):
+        """
+        Выполняется в фоновом потоке. Возвращает (данные графика, серия, итоги за всю историю,
+        (ключ, тепловая карта)):
+        массивы для графика считаются здесь же, GUI-потоку остаётся только нарисовать
+        """
+        heatmap = None
+        if heatmap_key == self.ALL_HABITS:
+            heatmap = heatmap_key, build_heatmap(list(self.model.get_all_bitmaps().values()))
+        elif heatmap_key is not None:
+            heatmap = heatmap_key, build_heatmap([self.model.get_habit_bitmap(heatmap_key)])
+
+        streak = self.model.get_habit_streak(habit_name)
+        history = self.model.get_habit_history_summary(habit_name)
+        if period is None:
+            granularity, rows = "hour", self.model.get_habit_static_daily(habit_name)
+        elif isinstance(period, tuple):
+            granularity, rows = self.model.get_habit_statistics(habit_name, *period)
         else:
-            text_from_time_box = self.window.TimeBox.currentText()
-            days = text_from_time_box.split()[1]
-            habit_data = self.model.get_habit_static_for_N_days(habit_name, days)
+            granularity, rows = self.model.get_habit_static_for_N_days(habit_name, period)
+        return build_chart(rows, granularity), streak, history, heatmap
 
-        self.plot_habit_progress(habit_data, is_stiic_daily)
+    def _on_data_loaded(self, request_id, result):
+        # Пока грузили, пользователь уже выбрал другую привычку или период
+        if request_id != self._request_id:
+            return
+        chart, streak, history, heatmap = result
+        self.plot_habit_progress(chart, streak, history)
+        if heatmap is not None:
+            self.plot_heatmap(*heatmap)
+
+    def plot_heatmap(self, key, heatmap):
+        """Рисует тепловую карту одной картинкой и показывает последний год"""
+        self._heatmap_key = key
+        self._heatmap = heatmap
+        grid = heatmap["grid"]
+        weeks = grid.shape[0]
+
+        self.heatmap_item.setImage(grid, levels=heatmap["levels"], autoLevels=False)
+        plot = self.heatmap_widget.getPlotItem()
+        plot.getAxis('bottom').setTicks([heatmap["month_ticks"]])
+        plot.setLimits(xMin=0, xMax=weeks, yMin=0, yMax=7)
+        plot.setXRange(max(weeks - self.HEATMAP_VISIBLE_WEEKS, 0), weeks, padding=0)
+
+    def on_habit_marked(self, habit_name, completed):
+        """
+        Вызывается контроллером привычек после отметки. Если цель на сегодня
+        достигнута - меняем одну ячейку уже загруженной карты, без запроса к БД
+        """
+        if not completed or self._heatmap is None:
+            return
+        if self._heatmap_key not in (habit_name, self.ALL_HABITS):
+            return
+
+        grid = self._heatmap["grid"]
+        week, weekday = heatmap_cell(self._heatmap["grid_start"], date.today())
+        if week >= grid.shape[0]:
+            # Карта построена вчера - перестроим целиком при следующей загрузке
+            self._heatmap_key = None
+            return
+        if self._heatmap_key == self.ALL_HABITS:
+            grid[week, weekday] += 1
+        else:
+            grid[week, weekday] = 1
+        self.heatmap_item.updateImage()
@@ -1,14 +1,19 @@
+import startup_trace  # первым: отсчёт времени запуска
 from PyQt6.QtWidgets import QApplication
 import sys
 from controller import StartUpController
 
+startup_trace.mark("imports")
+
 
 def main():
     """Точка входа в приложение"""
     app = QApplication(sys.argv)
+    startup_trace.mark("qapplication")
     
     # Создаём главный контроллер
     controller = StartUpController()
+    startup_trace.watch_first_paint(controller.login_window, "login_painted", startup_trace.exit_if_requested)
     controller.show_login_window()
     
     # Запускаем цикл обработки событий
@@ -16,6 +21,7 @@ def main():
     
     # При выходе из приложения корректно закрываем всё
     controller.shutdown()
+    startup_trace.report()
     
     sys.exit(exit_code)
 
@@ -1,6 +1,7 @@
 from .main_window_model import MainWindowModel
 from .registrarion_model import AuthModel
 from .database import DataBase
+from .config import load_config
 import os
 import sys
 import traceback
@@ -35,8 +36,11 @@ class Model:
         db_path = os.path.join(app_data_dir, 'habit_database.db')
         
         print(f"Database path: {db_path}")  # Для отладки
+
+        # Настройки из config.json рядом с базой (если он есть)
+        self.config = load_config(app_data_dir)
         
-        self.database = DataBase(db_path)
+        self.database = DataBase(db_path, self.config["sqlite"])
         self.user = None
         self.auth = AuthModel(self.database)
 
@@ -92,7 +96,7 @@ class Model:
 
     def init_user(self, user_id):
         """Инициализирует пользователя"""
-        self.user = MainWindowModel(self.database, user_id)
+        self.user = MainWindowModel(self.database, user_id, self.config["retention"])
 
     def get_user(self):
         return self.user
\ No newline at end of file
@@ -0,0 +1,108 @@
+from datetime import date, timedelta
+
+
+class HabitBitmap:
+    """
+    История выполнения привычки одним битовым полем: бит i - день start_day + i,
+    1 - цель в этот день достигнута. В БД хранится как BLOB (little-endian)
+    в таблице habit_bitmaps, 5 лет истории занимают ~230 байт.
+
+    Все подсчёты делаются масками и popcount (int.bit_count) над целым полем,
+    без цикла по дням.
+    """
+
+    def __init__(self, start_day=None, bits=0):
+        self.start_day = start_day
+        self.bits = bits
+
+    @classmethod
+    def from_blob(cls, start_day, blob):
+        if isinstance(start_day, str):
+            start_day = date.fromisoformat(start_day)
+        return cls(start_day, int.from_bytes(blob or b"", "little"))
+
+    def to_blob(self):
+        return self.bits.to_bytes((self.bits.bit_length() + 7) // 8, "little")
+
+    def __len__(self):
+        """Сколько дней покрывает поле (до последнего выполненного)"""
+        return self.bits.bit_length()
+
+    def _index(self, day):
+        return (day - self.start_day).days
+
+    def _range_mask(self, start, end):
+        """Маска битов для дней [start, end] с обрезкой по началу поля"""
+        first = max(self._index(start), 0)
+        last = self._index(end)
+        if last < first:
+            return 0
+        return ((1 << (last - first + 1)) - 1) << first
+
+    def set_day(self, day):
+        """Отмечает день выполненным. День раньше start_day сдвигает начало поля"""
+        if self.start_day is None:
+            self.start_day = day
+        elif day < self.start_day:
+            self.bits <<= (self.start_day - day).days
+            self.start_day = day
+        self.bits |= 1 << self._index(day)
+
+    def is_set(self, day):
+        if self.start_day is None or day < self.start_day:
+            return False
+        return bool(self.bits >> self._index(day) & 1)
+
+    def count(self, start, end):
+        """Сколько дней в [start, end] цель была достигнута"""
+        if self.start_day is None:
+            return 0
+        return (self.bits & self._range_mask(start, end)).bit_count()
+
+    def rate(self, start, end):
+        """Доля дней [start, end] с достигнутой целью"""
+        days = (end - start).days + 1
+        if days <= 0:
+            return 0.0
+        return self.count(start, end) / days
+
+    def last_day(self):
+        """Последний выполненный день (None, если поле пустое)"""
+        if not self.bits:
+            return None
+        return self.start_day + timedelta(days=self.bits.bit_length() - 1)
+
+    def streak_ending(self, day):
+        """Длина серии подряд выполненных дней, заканчивающейся в day"""
+        if not self.is_set(day):
+            return 0
+        last = self._index(day)
+        # Старший ноль среди битов [0, last] - день перед началом серии
+        zeros = ~self.bits & ((1 << (last + 1)) - 1)
+        return last + 1 if not zeros else last - zeros.bit_length() + 1
+
+    def current_streak(self, today=None):
+        """Текущая серия: заканчивается сегодня или, если сегодня ещё не выполнено, вчера"""
+        today = today or date.today()
+        return self.streak_ending(today) or self.streak_ending(today - timedelta(days=1))
+
+    def best_streak(self):
+        """Самая длинная серия: x &= x >> 1 укорачивает каждую серию на день"""
+        bits, length = self.bits, 0
+        while bits:
+            bits &= bits >> 1
+            length += 1
+        return length
+
+    def weekday_counts(self):
+        """Сколько раз цель достигнута по дням недели: [пн, вт, ..., вс]"""
+        if self.start_day is None:
+            return [0] * 7
+        weeks = len(self) // 7 + 1
+        # Биты 0, 7, 14, ... одним выражением: (2^(7n) - 1) / (2^7 - 1)
+        every_week = ((1 << (7 * weeks)) - 1) // 0x7F
+        counts = [0] * 7
+        for offset in range(7):
+            weekday = (self.start_day + timedelta(days=offset)).weekday()
+            counts[weekday] = (self.bits & (every_week << offset)).bit_count()
+        return counts
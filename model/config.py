@@ -0,0 +1,53 @@
+import json
+import os
+
+
+# Настройки по умолчанию. Любой ключ можно переопределить в config.json,
+# который лежит рядом с базой данных (см. get_app_data_dir)
+DEFAULT_CONFIG = {
+    "sqlite": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,   # мс
+        "temp_store": "MEMORY",
+        "cache_size": None,     # байты, None - подобрать по размеру базы
+        "mmap_size": None,      # байты, None - подобрать по размеру базы
+        "read_pool_size": 4,    # сколько потоков могут читать параллельно писателю
+    },
+    # Сколько хранить историю выполнения. Старые дни сначала сворачиваются
+    # в недельные и месячные агрегаты, месячные агрегаты хранятся всегда
+    "retention": {
+        "raw_days": 90,         # дни в habits_progress_monthly
+        "weekly_days": 730,     # недельные агрегаты
+    },
+    "ui": {
+        # Импортировать pyqtgraph/NumPy в простое после показа окна, а не при открытии статистики
+        "prewarm_statistics": True,
+        "prewarm_delay_ms": 1500,
+    },
+}
+
+CONFIG_FILE_NAME = "config.json"
+
+
+def load_config(app_dir):
+    """
+    Читает config.json из папки приложения и накладывает его на DEFAULT_CONFIG.
+    Если файла нет или он битый — возвращает настройки по умолчанию.
+    """
+    config = {section: dict(values) for section, values in DEFAULT_CONFIG.items()}
+    path = os.path.join(app_dir, CONFIG_FILE_NAME)
+    if not os.path.exists(path):
+        return config
+
+    try:
+        with open(path, 'r', encoding="utf-8") as file:
+            user_config = json.load(file)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Не удалось прочитать {path}: {e}")
+        return config
+
+    for section, values in user_config.items():
+        if section in config and isinstance(values, dict):
+            config[section].update(values)
+    return config
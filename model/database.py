@@ -1,4 +1,10 @@
 import sqlite3
+import os
+import threading
+from contextlib import contextmanager
+import startup_trace
+from .migrations import Migrations
+from .config import DEFAULT_CONFIG
 
 
 class DatabaseQueries:
@@ -6,51 +12,214 @@ class DatabaseQueries:
     
     # ========== Запросы для импорта/экспорта ==========
     GET_USER_HABITS = 'SELECT * FROM habits WHERE user_id = ?'
+
+    # Полная история для экспорта, читается курсором по частям (см. iter_rows)
+    EXPORT_USER_PROGRESS = """
+        SELECT h.name, hp.day, hp.date, hp.progress, hp.target, hp.marks
+        FROM habits h
+        JOIN habit_progress hp ON hp.habit_id = h.id
+        WHERE h.user_id = ?
+    """
+
+    EXPORT_USER_MONTHLY = """
+        SELECT h.name, m.date, m.progress, m.completed
+        FROM habits h
+        JOIN habits_progress_monthly m ON m.habit_id = h.id
+        WHERE h.user_id = ?
+    """
     
-    # Отдельный метод нужен чтобы не потерять время
+    # Отдельный метод нужен чтобы не потерять время.
+    # OR IGNORE: дубли по UNIQUE(user_id, name) просто пропускаются
     INSERT_IMPORTED_HABIT = """
-        INSERT INTO habits (user_id, name, category, daily_frequency, created_at)
+        INSERT OR IGNORE INTO habits (user_id, name, category, daily_frequency, created_at)
         VALUES (?, ?, ?, ?, ?)
     """
     
     # ========== Запросы для MainWindowModel ==========
+    # day - локальная дата записи (YYYY-MM-DD), пишется сразу при вставке,
+    # чтобы фильтр по дню шёл по индексу, а не через date(date, ...).
+    # На привычку и день в habit_progress ровно одна строка (UNIQUE(habit_id, day))
     ADD_HABIT_PROGRESS = """
-        INSERT INTO habit_progress (habit_id, date, progress, target)
-        VALUES (?, datetime('now', 'localtime'), ?, ?);
+        INSERT INTO habit_progress (habit_id, date, day, progress, target)
+        VALUES (?, datetime('now', 'localtime'), date('now', 'localtime'), ?, ?)
+        ON CONFLICT (habit_id, day) DO NOTHING;
+    """
+
+    # Отметка: +1 к счётчику за сегодня и время отметки в marks для дневного графика
+    MARK_HABIT_PROGRESS = """
+        INSERT INTO habit_progress (habit_id, date, day, progress, target, marks)
+        VALUES (?, datetime('now', 'localtime'), date('now', 'localtime'), 1, ?, time('now', 'localtime'))
+        ON CONFLICT (habit_id, day) DO UPDATE SET
+            progress = progress + 1,
+            target = excluded.target,
+            date = excluded.date,
+            marks = CASE WHEN marks IS NULL OR marks = '' THEN excluded.marks
+                         ELSE marks || ',' || excluded.marks END;
     """
     
     GET_LAST_TODAY_PROGRESS = """
         SELECT progress, target
         FROM habit_progress
         WHERE habit_id = ? 
-        AND date(date, 'localtime') = date('now', 'localtime')
-        ORDER BY id DESC
-        LIMIT 1;
-    """
-    
-    CHECK_IF_TODAY_MONTHLY_EXISTS = """
-        SELECT id
-        FROM habits_progress_monthly
-        WHERE habit_id = ? AND date = date('now', 'localtime');
-    """
-    
-    GET_LAST_HABIT_PROGRESS_AND_TARGET = """
-        SELECT progress, target
-        FROM habit_progress
-        WHERE habit_id = ? AND date(date, 'localtime') = date('now', 'localtime')
-        ORDER BY id DESC
-        LIMIT 1;
+        AND day = date('now', 'localtime');
     """
     
+    # В habits_progress_monthly тоже одна строка на привычку и день (UNIQUE(habit_id, date))
     ADD_MONTHLY_PROGRESS = """
         INSERT INTO habits_progress_monthly (habit_id, date, completed)
-        VALUES (?, date('now', 'localtime'), ?);
+        VALUES (?, date('now', 'localtime'), ?)
+        ON CONFLICT (habit_id, date) DO NOTHING;
     """
-    
-    UPDATE_LAST_HABIT_PROGRESS_MONTHLY = """
-        UPDATE habits_progress_monthly
-        SET completed = ?
-        WHERE habit_id = ? AND date = date('now', 'localtime');
+
+    # Счётчик дня копируется в monthly при каждой отметке: после смены дня строка
+    # habit_progress удаляется, а из monthly потом собираются агрегаты (см. ROLLUP_*)
+    MARK_MONTHLY_PROGRESS = """
+        INSERT INTO habits_progress_monthly (habit_id, date, progress, completed)
+        VALUES (?, date('now', 'localtime'), ?, ?)
+        ON CONFLICT (habit_id, date) DO UPDATE SET
+            progress = excluded.progress,
+            completed = MAX(completed, excluded.completed);
+    """
+
+    # ========== Серии выполнения (habit_streaks) ==========
+    # Вызывается, когда цель на сегодня достигнута. Серия продолжается, если последний
+    # выполненный день - вчера, и не меняется при повторном вызове в тот же день.
+    # В SET все колонки берутся со старыми значениями, поэтому CASE повторяется для best
+    MARK_STREAK_DAY = """
+        INSERT INTO habit_streaks (habit_id, current, best, last_day)
+        VALUES (?, 1, 1, date('now', 'localtime'))
+        ON CONFLICT (habit_id) DO UPDATE SET
+            current = CASE
+                WHEN last_day = date('now', 'localtime') THEN current
+                WHEN last_day = date('now', 'localtime', '-1 day') THEN current + 1
+                ELSE 1 END,
+            best = MAX(best, CASE
+                WHEN last_day = date('now', 'localtime') THEN current
+                WHEN last_day = date('now', 'localtime', '-1 day') THEN current + 1
+                ELSE 1 END),
+            last_day = excluded.last_day;
+    """
+
+    # При смене дня обнуляем серии, у которых пропущен вчерашний день
+    BREAK_STALE_STREAKS = """
+        UPDATE habit_streaks
+        SET current = 0
+        WHERE habit_id IN (SELECT id FROM habits WHERE user_id = ?)
+          AND current > 0
+          AND last_day < date('now', 'localtime', '-1 day');
+    """
+
+    # Пересчёт серий пользователя по истории за один проход (gaps and islands):
+    # у подряд идущих выполненных дней julianday(date) - ROW_NUMBER() одинаков.
+    # Нужен только миграции 6, пока битовых полей ещё нет; в приложении серии
+    # пересчитываются по habit_bitmaps (MainWindowModel.rebuild_streaks), где вся история цела
+    REBUILD_USER_STREAKS = """
+        WITH done AS (
+            SELECT m.habit_id, m.date,
+                   julianday(m.date) - ROW_NUMBER() OVER (PARTITION BY m.habit_id ORDER BY m.date) AS grp
+            FROM habits h
+            JOIN habits_progress_monthly m ON m.habit_id = h.id
+            WHERE h.user_id = ?
+              AND m.completed = 1
+        ),
+        runs AS (
+            SELECT habit_id, COUNT(*) AS len, MAX(date) AS end_day,
+                   MAX(MAX(date)) OVER (PARTITION BY habit_id) AS last_day
+            FROM done
+            GROUP BY habit_id, grp
+        )
+        INSERT INTO habit_streaks (habit_id, current, best, last_day)
+        SELECT habit_id,
+               SUM(CASE WHEN end_day = last_day
+                         AND end_day >= date('now', 'localtime', '-1 day') THEN len ELSE 0 END),
+               MAX(len),
+               MAX(last_day)
+        FROM runs
+        WHERE true
+        GROUP BY habit_id
+        ON CONFLICT (habit_id) DO UPDATE SET
+            current = excluded.current,
+            best = MAX(best, excluded.best),
+            last_day = excluded.last_day;
+    """
+
+    # Серия, посчитанная по битовому полю (см. MainWindowModel.rebuild_streaks)
+    SAVE_HABIT_STREAK = """
+        INSERT INTO habit_streaks (habit_id, current, best, last_day)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (habit_id) DO UPDATE SET
+            current = excluded.current,
+            best = MAX(best, excluded.best),
+            last_day = excluded.last_day;
+    """
+
+    GET_HABIT_STREAK = """
+        SELECT current, best, last_day
+        FROM habit_streaks
+        WHERE habit_id = ?
+    """
+
+    DELETE_HABIT_STREAK = "DELETE FROM habit_streaks WHERE habit_id = ?"
+
+    DELETE_USER_STREAKS = """
+        DELETE FROM habit_streaks
+        WHERE habit_id IN (SELECT id FROM habits WHERE user_id = ?)
+    """
+
+    # ========== Битовая история выполнения (habit_bitmaps, см. model/bitmap.py) ==========
+    GET_HABIT_BITMAP = """
+        SELECT start_day, bits
+        FROM habit_bitmaps
+        WHERE habit_id = ?
+    """
+
+    GET_USER_BITMAPS = """
+        SELECT h.id, h.name, b.start_day, b.bits
+        FROM habits h
+        JOIN habit_bitmaps b ON b.habit_id = h.id
+        WHERE h.user_id = ?
+    """
+
+    SAVE_HABIT_BITMAP = """
+        INSERT INTO habit_bitmaps (habit_id, start_day, bits)
+        VALUES (?, ?, ?)
+        ON CONFLICT (habit_id) DO UPDATE SET
+            start_day = excluded.start_day,
+            bits = excluded.bits;
+    """
+
+    # Выполненные дни из истории, сгруппированные по привычке - для пересборки битовых полей
+    GET_USER_COMPLETED_DAYS = """
+        SELECT m.habit_id, m.date
+        FROM habits h
+        JOIN habits_progress_monthly m ON m.habit_id = h.id
+        WHERE h.user_id = ?
+          AND m.completed = 1
+        ORDER BY m.habit_id
+    """
+
+    DELETE_HABIT_BITMAP = "DELETE FROM habit_bitmaps WHERE habit_id = ?"
+
+    DELETE_USER_BITMAPS = """
+        DELETE FROM habit_bitmaps
+        WHERE habit_id IN (SELECT id FROM habits WHERE user_id = ?)
+    """
+
+    # Начало нового дня сразу для всех привычек пользователя, без цикла в Python
+    INIT_TODAY_PROGRESS_FOR_USER = """
+        INSERT INTO habit_progress (habit_id, date, day, progress, target)
+        SELECT id, datetime('now', 'localtime'), date('now', 'localtime'), 0, daily_frequency
+        FROM habits
+        WHERE user_id = ?
+        ON CONFLICT (habit_id, day) DO NOTHING;
+    """
+
+    INIT_TODAY_MONTHLY_FOR_USER = """
+        INSERT INTO habits_progress_monthly (habit_id, date, completed)
+        SELECT id, date('now', 'localtime'), 0
+        FROM habits
+        WHERE user_id = ?
+        ON CONFLICT (habit_id, date) DO NOTHING;
     """
     
     GET_HABIT_TARGET = """
@@ -70,23 +239,68 @@ class DatabaseQueries:
         WHERE user_id = ?
     """
     
+    # Привычки вместе с прогрессом за сегодня и сериями одним запросом.
+    # JOIN идут по уникальному индексу (habit_id, day) и первичному ключу habit_streaks
+    SELECT_HABITS_WITH_TODAY_PROGRESS = """
+        SELECT h.id, h.name, h.category, h.daily_frequency, h.created_at,
+               COALESCE(hp.progress, 0) AS progress,
+               COALESCE(hp.target, h.daily_frequency) AS target,
+               COALESCE(s.current, 0) AS streak,
+               COALESCE(s.best, 0) AS best_streak
+        FROM habits h
+        LEFT JOIN habit_progress hp
+            ON hp.habit_id = h.id AND hp.day = date('now', 'localtime')
+        LEFT JOIN habit_streaks s
+            ON s.habit_id = h.id
+        WHERE h.user_id = ?
+    """
+
+    # То же для одной привычки: после отметки в таблице обновляется одна строка
+    SELECT_HABIT_WITH_TODAY_PROGRESS = """
+        SELECT h.id, h.name, h.category, h.daily_frequency, h.created_at,
+               COALESCE(hp.progress, 0) AS progress,
+               COALESCE(hp.target, h.daily_frequency) AS target,
+               COALESCE(s.current, 0) AS streak,
+               COALESCE(s.best, 0) AS best_streak
+        FROM habits h
+        LEFT JOIN habit_progress hp
+            ON hp.habit_id = h.id AND hp.day = date('now', 'localtime')
+        LEFT JOIN habit_streaks s
+            ON s.habit_id = h.id
+        WHERE h.user_id = ? AND h.name = ?
+    """
+    
     SELECT_CATEGORIES_QUERY = """
         SELECT DISTINCT category
         FROM habits
         WHERE user_id = ?
     """
     
+    # Удаляет прошлые дни только у привычек пользователя и не больше LIMIT строк за раз.
+    # Идёт по индексам habits(user_id) и habit_progress(habit_id, day)
     RESET_DAILY_PROGRESS = """
         DELETE FROM habit_progress
-        WHERE date(date, 'localtime') < date('now', 'localtime');
+        WHERE id IN (
+            SELECT hp.id
+            FROM habits h
+            JOIN habit_progress hp ON hp.habit_id = h.id
+            WHERE h.user_id = ?
+              AND hp.day < date('now', 'localtime')
+            LIMIT ?
+        );
     """
-    
-    IS_HABIT_COMPLETED_TODAY = """
-        SELECT progress, target
-        FROM habit_progress
-        WHERE habit_id = ?
-        ORDER BY id DESC
-        LIMIT 1
+
+    # День, для которого у пользователя уже выполнен переход на новый день
+    GET_LAST_ROLLOVER = """
+        SELECT last_rollover
+        FROM users
+        WHERE id = ?
+    """
+
+    SET_LAST_ROLLOVER = """
+        UPDATE users
+        SET last_rollover = date('now', 'localtime')
+        WHERE id = ?
     """
     
     DELETE_HABIT_PROGRESS = """
@@ -100,6 +314,16 @@ class DatabaseQueries:
     """
     
     DELETE_HABITS = "DELETE FROM habits WHERE user_id = ?"
+
+    DELETE_USER_HABITS_PROGRESS = """
+        DELETE FROM habit_progress
+        WHERE habit_id IN (SELECT id FROM habits WHERE user_id = ?)
+    """
+
+    DELETE_USER_HABITS_PROGRESS_MONTHLY = """
+        DELETE FROM habits_progress_monthly
+        WHERE habit_id IN (SELECT id FROM habits WHERE user_id = ?)
+    """
     
     DELETE_HABIT_QUERY = """
         DELETE FROM habits
@@ -112,34 +336,154 @@ class DatabaseQueries:
         WHERE user_id = ? AND name = ?
     """
     
-    GET_LAST_DATE_QUERY = """
-        SELECT last_login AS date
-        FROM users
-        WHERE id = ?
-        ORDER BY date DESC
-        LIMIT 1
-    """
-    
     GET_DAILY_PROGRESS = """
-        SELECT date, progress
+        SELECT day, progress, marks
         FROM habit_progress
         WHERE habit_id = ?
-        AND date(date, 'localtime') = date('now', 'localtime')
-        ORDER BY date ASC;
+        AND day = date('now', 'localtime');
     """
     
-    GET_HABIT_STATISTIC_FOR_N_DAYS = """
-        SELECT completed, date
+    # ========== Статистика за произвольный период ==========
+    # Все три запроса отдают (period, value): начало периода и долю дней с выполненной целью.
+    # По дням - диапазон по уникальному индексу (habit_id, date)
+    STATS_BY_DAY = """
+        SELECT date AS period, CAST(completed AS REAL) AS value
         FROM habits_progress_monthly
         WHERE habit_id = ?
-          AND date >= date('now', 'localtime', '-' || ? || ' days')
+          AND date BETWEEN ? AND ?
         ORDER BY date ASC;
     """
+
+    # По неделям и месяцам - готовые агрегаты плюс дни, которые ещё не свёрнуты
+    # (после last_rollup_day, обычно только сегодня).
+    # Параметры: (habit_id, начало первого периода, конец, habit_id, начало, конец, user_id)
+    STATS_BY_WEEK = """
+        SELECT period_start AS period, CAST(SUM(target_hits) AS REAL) / SUM(days) AS value
+        FROM (
+            SELECT period_start, days, target_hits
+            FROM habit_rollup_weekly
+            WHERE habit_id = ?
+              AND period_start BETWEEN ? AND ?
+            UNION ALL
+            SELECT date(date, '-6 days', 'weekday 1'), 1, completed
+            FROM habits_progress_monthly
+            WHERE habit_id = ?
+              AND date BETWEEN ? AND ?
+              AND date > (SELECT COALESCE(last_rollup_day, '') FROM users WHERE id = ?)
+        )
+        GROUP BY period_start
+        ORDER BY period_start ASC;
+    """
+
+    STATS_BY_MONTH = """
+        SELECT period_start AS period, CAST(SUM(target_hits) AS REAL) / SUM(days) AS value
+        FROM (
+            SELECT period_start, days, target_hits
+            FROM habit_rollup_monthly
+            WHERE habit_id = ?
+              AND period_start BETWEEN ? AND ?
+            UNION ALL
+            SELECT strftime('%Y-%m-01', date), 1, completed
+            FROM habits_progress_monthly
+            WHERE habit_id = ?
+              AND date BETWEEN ? AND ?
+              AND date > (SELECT COALESCE(last_rollup_day, '') FROM users WHERE id = ?)
+        )
+        GROUP BY period_start
+        ORDER BY period_start ASC;
+    """
     
-    DELETE_OLD_MONTHLY_PROGRESS = """
+    # ========== Агрегаты и срок хранения истории ==========
+    # Дни пользователя после last_rollup_day и до сегодняшнего (не включая)
+    # досуммируются в недельные и месячные агрегаты. Каждый день попадает
+    # в агрегат ровно один раз, поэтому при повторном запуске трогаются только новые дни.
+    # Неделя начинается с понедельника: '-6 days', 'weekday 1' - понедельник этой недели
+    ROLLUP_WEEKLY = """
+        INSERT INTO habit_rollup_weekly (habit_id, period_start, days, completions, target_hits, rate)
+        SELECT m.habit_id, date(m.date, '-6 days', 'weekday 1') AS period_start,
+               COUNT(*), SUM(m.progress), SUM(m.completed),
+               CAST(SUM(m.completed) AS REAL) / COUNT(*)
+        FROM habits h
+        JOIN habits_progress_monthly m ON m.habit_id = h.id
+        WHERE h.user_id = ?
+          AND m.date > ?
+          AND m.date < date('now', 'localtime')
+        GROUP BY m.habit_id, period_start
+        ON CONFLICT (habit_id, period_start) DO UPDATE SET
+            days = days + excluded.days,
+            completions = completions + excluded.completions,
+            target_hits = target_hits + excluded.target_hits,
+            rate = CAST(target_hits + excluded.target_hits AS REAL) / (days + excluded.days);
+    """
+
+    ROLLUP_MONTHLY = """
+        INSERT INTO habit_rollup_monthly (habit_id, period_start, days, completions, target_hits, rate)
+        SELECT m.habit_id, strftime('%Y-%m-01', m.date) AS period_start,
+               COUNT(*), SUM(m.progress), SUM(m.completed),
+               CAST(SUM(m.completed) AS REAL) / COUNT(*)
+        FROM habits h
+        JOIN habits_progress_monthly m ON m.habit_id = h.id
+        WHERE h.user_id = ?
+          AND m.date > ?
+          AND m.date < date('now', 'localtime')
+        GROUP BY m.habit_id, period_start
+        ON CONFLICT (habit_id, period_start) DO UPDATE SET
+            days = days + excluded.days,
+            completions = completions + excluded.completions,
+            target_hits = target_hits + excluded.target_hits,
+            rate = CAST(target_hits + excluded.target_hits AS REAL) / (days + excluded.days);
+    """
+
+    # Последний день, уже учтённый в агрегатах ('' - ещё ни одного)
+    GET_LAST_ROLLUP_DAY = """
+        SELECT COALESCE(last_rollup_day, '') AS last_rollup_day
+        FROM users
+        WHERE id = ?
+    """
+
+    SET_LAST_ROLLUP_DAY = """
+        UPDATE users
+        SET last_rollup_day = date('now', 'localtime', '-1 day')
+        WHERE id = ?
+    """
+
+    # Сырые дни старше горизонта удаляются, только если уже попали в агрегаты.
+    # Параметры: (user_id, дней хранения, user_id, LIMIT)
+    PURGE_OLD_MONTHLY_PROGRESS = """
         DELETE FROM habits_progress_monthly
-        WHERE date < date('now', 'localtime', '-30 days');
+        WHERE id IN (
+            SELECT m.id
+            FROM habits h
+            JOIN habits_progress_monthly m ON m.habit_id = h.id
+            WHERE h.user_id = ?
+              AND m.date < date('now', 'localtime', '-' || ? || ' days')
+              AND m.date <= (SELECT COALESCE(last_rollup_day, '') FROM users WHERE id = ?)
+            LIMIT ?
+        );
+    """
+
+    # Недельные агрегаты старше горизонта; месячные хранятся всегда
+    PURGE_OLD_WEEKLY_ROLLUP = """
+        DELETE FROM habit_rollup_weekly
+        WHERE habit_id IN (SELECT id FROM habits WHERE user_id = ?)
+          AND period_start < date('now', 'localtime', '-' || ? || ' days');
     """
+
+    DELETE_HABIT_ROLLUP_WEEKLY = "DELETE FROM habit_rollup_weekly WHERE habit_id = ?"
+
+    DELETE_HABIT_ROLLUP_MONTHLY = "DELETE FROM habit_rollup_monthly WHERE habit_id = ?"
+
+    DELETE_USER_ROLLUP_WEEKLY = """
+        DELETE FROM habit_rollup_weekly
+        WHERE habit_id IN (SELECT id FROM habits WHERE user_id = ?)
+    """
+
+    DELETE_USER_ROLLUP_MONTHLY = """
+        DELETE FROM habit_rollup_monthly
+        WHERE habit_id IN (SELECT id FROM habits WHERE user_id = ?)
+    """
+
+    RESET_LAST_ROLLUP_DAY = "UPDATE users SET last_rollup_day = NULL WHERE id = ?"
     
     # ========== Запросы для AuthModel ==========
     INSERT_USER = "INSERT INTO users (username, password) VALUES (?, ?)"
@@ -181,7 +525,9 @@ class DatabaseQueries:
                 username TEXT UNIQUE NOT NULL,
                 password TEXT        NOT NULL,
                 last_login TEXT DEFAULT (date('now', 'localtime')),
-                theme    TEXT DEFAULT 'dark'
+                theme    TEXT DEFAULT 'dark',
+                last_rollover TEXT,
+                last_rollup_day TEXT
             )
         """
     
@@ -205,9 +551,12 @@ class DatabaseQueries:
                 id         INTEGER PRIMARY KEY AUTOINCREMENT,
                 habit_id   INTEGER,
                 date       TEXT DEFAULT (datetime('now', 'localtime')),
+                day        TEXT DEFAULT (date('now', 'localtime')),
                 progress   INTEGER DEFAULT 0,
                 target     INTEGER DEFAULT 1,
-                FOREIGN KEY (habit_id) REFERENCES habits (id)
+                marks      TEXT DEFAULT '',
+                FOREIGN KEY (habit_id) REFERENCES habits (id),
+                UNIQUE(habit_id, day)
             )               
         """
     
@@ -217,25 +566,280 @@ class DatabaseQueries:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 habit_id INTEGER,
                 date TEXT DEFAULT (date('now', 'localtime')),
+                progress INTEGER DEFAULT 0,
                 completed INTEGER DEFAULT 0,
                 FOREIGN KEY (habit_id) REFERENCES habits (id)
             )  
         """
 
+    # Агрегаты по неделям и месяцам: period_start - понедельник недели / первое число месяца,
+    # days - сколько дней учтено, completions - сумма отметок, target_hits - дней с выполненной целью
+    SQL_INIT_ROLLUP_WEEKLY_TABLE = """
+            CREATE TABLE IF NOT EXISTS habit_rollup_weekly
+            (
+                habit_id     INTEGER NOT NULL,
+                period_start TEXT    NOT NULL,
+                days         INTEGER DEFAULT 0,
+                completions  INTEGER DEFAULT 0,
+                target_hits  INTEGER DEFAULT 0,
+                rate         REAL    DEFAULT 0,
+                FOREIGN KEY (habit_id) REFERENCES habits (id),
+                PRIMARY KEY (habit_id, period_start)
+            )
+        """
+
+    # Серии по привычке: current - текущая (0 - прервана), best - рекорд,
+    # last_day - последний день с выполненной целью
+    SQL_INIT_STREAKS_TABLE = """
+            CREATE TABLE IF NOT EXISTS habit_streaks
+            (
+                habit_id INTEGER PRIMARY KEY,
+                current  INTEGER DEFAULT 0,
+                best     INTEGER DEFAULT 0,
+                last_day TEXT,
+                FOREIGN KEY (habit_id) REFERENCES habits (id)
+            )
+        """
+
+    # Вся история выполнения привычки одним BLOB: бит i - день start_day + i
+    SQL_INIT_BITMAPS_TABLE = """
+            CREATE TABLE IF NOT EXISTS habit_bitmaps
+            (
+                habit_id  INTEGER PRIMARY KEY,
+                start_day TEXT NOT NULL,
+                bits      BLOB NOT NULL,
+                FOREIGN KEY (habit_id) REFERENCES habits (id)
+            )
+        """
+
+    SQL_INIT_ROLLUP_MONTHLY_TABLE = """
+            CREATE TABLE IF NOT EXISTS habit_rollup_monthly
+            (
+                habit_id     INTEGER NOT NULL,
+                period_start TEXT    NOT NULL,
+                days         INTEGER DEFAULT 0,
+                completions  INTEGER DEFAULT 0,
+                target_hits  INTEGER DEFAULT 0,
+                rate         REAL    DEFAULT 0,
+                FOREIGN KEY (habit_id) REFERENCES habits (id),
+                PRIMARY KEY (habit_id, period_start)
+            )
+        """
+
+    # ======= Запросы для миграций (см. model/migrations.py)
+
+    # В старых базах колонки day нет, ALTER TABLE не умеет default с функцией,
+    # поэтому добавляем её без default и заполняем из date
+    ADD_DAY_COLUMN_TO_PROGRESS = "ALTER TABLE habit_progress ADD COLUMN day TEXT"
+
+    # Заполняем пачками, чтобы большая база мигрировала с ограниченной памятью
+    # Пачками по диапазону id (id > ? AND id <= ?), см. Migrations._run_in_id_ranges.
+    # "WHERE day IS NULL LIMIT ?" без индекса по day каждый раз просматривал бы уже заполненные строки
+    BACKFILL_PROGRESS_DAY = """
+        UPDATE habit_progress
+        SET day = date(date)
+        WHERE id > ? AND id <= ?
+    """
+
+    GET_MAX_PROGRESS_ID = "SELECT MAX(id) FROM habit_progress"
+
+    SQL_INIT_PROGRESS_DAY_INDEX = """
+            CREATE INDEX IF NOT EXISTS idx_habit_progress_habit_day
+            ON habit_progress (habit_id, day)
+        """
+
+    # Было: новая строка на каждую отметку. Стало: одна строка на привычку и день
+    RENAME_PROGRESS_LOG = "ALTER TABLE habit_progress RENAME TO habit_progress_log"
+
+    # Берём последнюю строку дня (bare-колонки при MAX(id) в SQLite берутся из неё),
+    # а времена ненулевых отметок склеиваем в marks
+    COMPACT_PROGRESS_LOG = """
+        INSERT INTO habit_progress (habit_id, date, day, progress, target, marks)
+        SELECT habit_id, date, day, progress, target, COALESCE(marks, '')
+        FROM (
+            SELECT habit_id, date, day, progress, target, MAX(id),
+                   group_concat(CASE WHEN progress > 0 THEN time(date) END, ',') AS marks
+            FROM (SELECT * FROM habit_progress_log ORDER BY id)
+            GROUP BY habit_id, day
+        )
+    """
+
+    DROP_PROGRESS_LOG = "DROP TABLE habit_progress_log"
+
+    DROP_PROGRESS_DAY_INDEX = "DROP INDEX IF EXISTS idx_habit_progress_habit_day"
+
+    # Дубли (привычка, день) в monthly: оставляем последнюю строку с максимальным completed
+    MERGE_MONTHLY_DUPLICATES = """
+        UPDATE habits_progress_monthly
+        SET completed = (
+            SELECT MAX(m.completed)
+            FROM habits_progress_monthly m
+            WHERE m.habit_id = habits_progress_monthly.habit_id
+              AND m.date = habits_progress_monthly.date
+        )
+        WHERE id IN (
+            SELECT MAX(id) FROM habits_progress_monthly
+            GROUP BY habit_id, date
+            HAVING COUNT(*) > 1
+        )
+    """
+
+    DELETE_MONTHLY_DUPLICATES = """
+        DELETE FROM habits_progress_monthly
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM habits_progress_monthly
+            GROUP BY habit_id, date
+        )
+    """
+
+    ADD_LAST_ROLLOVER_COLUMN = "ALTER TABLE users ADD COLUMN last_rollover TEXT"
+
+    ADD_MONTHLY_PROGRESS_COLUMN = "ALTER TABLE habits_progress_monthly ADD COLUMN progress INTEGER DEFAULT 0"
+
+    # Счётчик берём из habit_progress, если день ещё там, иначе считаем одну отметку на выполненный день
+    # Пачками по диапазону id (id > ? AND id <= ?), см. Migrations._run_in_id_ranges
+    BACKFILL_MONTHLY_PROGRESS = """
+        UPDATE habits_progress_monthly
+        SET progress = COALESCE(
+            (SELECT hp.progress FROM habit_progress hp
+             WHERE hp.habit_id = habits_progress_monthly.habit_id
+               AND hp.day = habits_progress_monthly.date),
+            completed
+        )
+        WHERE id > ? AND id <= ?
+    """
+
+    GET_MAX_MONTHLY_ID = "SELECT MAX(id) FROM habits_progress_monthly"
+
+    ADD_LAST_ROLLUP_DAY_COLUMN = "ALTER TABLE users ADD COLUMN last_rollup_day TEXT"
+
+    GET_ALL_USER_IDS = "SELECT id FROM users"
+
+    DROP_MONTHLY_DAY_INDEX = "DROP INDEX IF EXISTS idx_habits_progress_monthly_habit_date"
+
+    SQL_INIT_MONTHLY_UNIQUE_DAY_INDEX = """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_habits_progress_monthly_habit_day
+            ON habits_progress_monthly (habit_id, date)
+        """
+
+    SQL_INIT_MONTHLY_DAY_INDEX = """
+            CREATE INDEX IF NOT EXISTS idx_habits_progress_monthly_habit_date
+            ON habits_progress_monthly (habit_id, date)
+        """
+
 class DataBase(DatabaseQueries):
     """Класс БД который реализует методы для работы с БД"""
+
+    # Границы автоподбора кэша и mmap по размеру файла базы
+    MIN_CACHE_SIZE = 2 * 1024 * 1024
+    MAX_CACHE_SIZE = 64 * 1024 * 1024
+    MAX_MMAP_SIZE = 256 * 1024 * 1024
     
-    def __init__(self, db_path):
+    def __init__(self, db_path, profile=None):
         super().__init__()
+        # Глубина вложенности transaction(): 0 - вне транзакции
+        self._transaction_depth = 0
+        # Поток, который сейчас держит транзакцию: его чтения идут через писателя,
+        # чтобы видеть свои же незакоммиченные изменения
+        self._transaction_thread = None
+        # Все записи идут через одно соединение-писатель под этим замком
+        # (им пользуются и GUI-поток, и фоновый поток БД из controller/db_worker.py)
+        self.lock = threading.RLock()
+        # Пул соединений для чтения: у каждого потока своё, не больше read_pool_size.
+        # В режиме WAL они читают параллельно с писателем и не ждут замок
+        self.db_path = db_path
+        self._local = threading.local()
+        self._read_connections = []
+        self._pool_lock = threading.Lock()
+        self.profile = self.build_profile(db_path, profile or {})
         self._initialize_tables(db_path)
 
+    def build_profile(self, db_path, overrides):
+        """
+        Собирает набор PRAGMA для соединения. cache_size и mmap_size,
+        не заданные явно, подбираются по текущему размеру файла базы.
+        """
+        profile = dict(DEFAULT_CONFIG["sqlite"])
+        profile.update(overrides)
+
+        try:
+            db_size = os.path.getsize(db_path)
+        except OSError:
+            # Базы ещё нет (первый запуск) или она в памяти
+            db_size = 0
+
+        if profile["cache_size"] is None:
+            # Кэш на четверть базы, но в разумных пределах
+            profile["cache_size"] = min(max(db_size // 4, self.MIN_CACHE_SIZE), self.MAX_CACHE_SIZE)
+        if profile["mmap_size"] is None:
+            # С запасом на рост базы, чтобы не пересчитывать при каждом запуске
+            profile["mmap_size"] = min(db_size * 2, self.MAX_MMAP_SIZE)
+        return profile
+
+    def _apply_profile(self, cursor, for_reading=False):
+        """Применяет PRAGMA из self.profile к соединению курсора"""
+        profile = self.profile
+        # PRAGMA не принимают параметры через ?, поэтому значения приводим к int
+        # или проверяем по белому списку
+        journal_mode = str(profile["journal_mode"]).upper()
+        if journal_mode not in ("WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "OFF"):
+            journal_mode = "WAL"
+        synchronous = str(profile["synchronous"]).upper()
+        if synchronous not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+            synchronous = "NORMAL"
+        temp_store = str(profile["temp_store"]).upper()
+        if temp_store not in ("DEFAULT", "FILE", "MEMORY"):
+            temp_store = "MEMORY"
+
+        if for_reading:
+            # Режим журнала хранится в самом файле, его выставляет писатель
+            cursor.execute("PRAGMA query_only = ON")
+        else:
+            cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+            cursor.execute(f"PRAGMA synchronous = {synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout = {int(profile['busy_timeout'])}")
+        cursor.execute(f"PRAGMA temp_store = {temp_store}")
+        # Отрицательный cache_size в SQLite означает размер в КиБ, а не в страницах
+        cursor.execute(f"PRAGMA cache_size = {-(int(profile['cache_size']) // 1024)}")
+        cursor.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+
     def _get_connection(self, db_path):
-        self.connection = sqlite3.connect(db_path)
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
         self.connection.row_factory = sqlite3.Row
         self.cursor = self.connection.cursor()
+        self._apply_profile(self.cursor)
+        # Без WAL читатели блокировали бы писателя, а база в памяти у каждого
+        # соединения своя - в этих случаях всё читаем через писателя
+        journal_mode = self.cursor.execute("PRAGMA journal_mode").fetchone()[0]
+        self.read_pool_size = int(self.profile["read_pool_size"])
+        if journal_mode.lower() != "wal" or db_path == ":memory:":
+            self.read_pool_size = 0
+
+    def _get_read_connection(self):
+        """
+        Возвращает соединение для чтения текущего потока или None,
+        если читать нужно через писателя (пул заполнен, поток в транзакции и т.п.)
+        """
+        if self._transaction_thread == threading.get_ident():
+            return None
+
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            return connection
+
+        with self._pool_lock:
+            if not self.is_connected() or len(self._read_connections) >= self.read_pool_size:
+                return None
+            connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            self._apply_profile(connection.cursor(), for_reading=True)
+            self._read_connections.append(connection)
+        self._local.connection = connection
+        return connection
 
     def _initialize_tables(self, db_path):
         self._get_connection(db_path)
+        startup_trace.mark("db_open")
         self.cursor.execute(self.SQL_INIT_USER_TABLE)
 
         self.cursor.execute(self.SQL_INIT_HABITS_TABLE)
@@ -243,15 +847,35 @@ class DataBase(DatabaseQueries):
         self.cursor.execute(self.SQL_INIT_HABITS_PROGRESS_TABLE)
 
         self.cursor.execute(self.SQL_INIT_HABITS_MONTHLY_PROGRESS_TABLE)
+
+        self.cursor.execute(self.SQL_INIT_ROLLUP_WEEKLY_TABLE)
+
+        self.cursor.execute(self.SQL_INIT_ROLLUP_MONTHLY_TABLE)
+
+        self.cursor.execute(self.SQL_INIT_STREAKS_TABLE)
+
+        self.cursor.execute(self.SQL_INIT_BITMAPS_TABLE)
         
         self.connection.commit()
+        startup_trace.mark("db_tables")
+
+        # Всё, что появилось в схеме после первой версии, докатываем миграциями
+        self.migration_report = Migrations(self.connection).run()
+        startup_trace.mark("db_migrations")
 
     def close(self):
         """Закрывает соединение с базой данных"""
         if hasattr(self, 'connection') and self.connection:
             try:
-                self.connection.close()
-                self.connection = None
+                with self.lock, self._pool_lock:
+                    for connection in self._read_connections:
+                        connection.close()
+                    self._read_connections = []
+                    # Соединения других потоков уже закрыты, новые они не откроют,
+                    # потому что is_connected() станет False
+                    self._local = threading.local()
+                    self.connection.close()
+                    self.connection = None
             except Exception as e:
                 print(f"Ошибка при закрытии БД: {e}")
 
@@ -260,25 +884,144 @@ class DataBase(DatabaseQueries):
         return hasattr(self, 'connection') and self.connection is not None
 
     def commit_changes(self):
-        """Сохраняет изменения в БД"""
-        if self.is_connected():
-            self.connection.commit()
+        """Сохраняет изменения в БД (внутри transaction() коммит делает она сама)"""
+        with self.lock:
+            if self.is_connected() and self._transaction_depth == 0:
+                self.connection.commit()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Объединяет все запросы внутри блока with в одну транзакцию:
+        при выходе без ошибок - один коммит, при исключении - откат.
+        Вложенные вызовы работают через SAVEPOINT и откатывают только свою часть.
+        Пока транзакция открыта, другие потоки ждут замок соединения.
+        """
+        with self.lock:
+            if not self.is_connected():
+                raise sqlite3.ProgrammingError("Database connection is closed")
+
+            depth = self._transaction_depth
+            savepoint = f"sp_{depth}"
+            if depth == 0:
+                # sqlite3 сам открывает транзакцию перед DML; если такой запрос упал
+                # вне transaction(), она так и осталась висеть - откатываем её
+                if self.connection.in_transaction:
+                    self.connection.rollback()
+                self.cursor.execute("BEGIN")
+                self._transaction_thread = threading.get_ident()
+            else:
+                self.cursor.execute(f"SAVEPOINT {savepoint}")
+            self._transaction_depth += 1
+
+            try:
+                yield self
+            except BaseException:
+                self._transaction_depth -= 1
+                if depth == 0:
+                    self._transaction_thread = None
+                    self.connection.rollback()
+                else:
+                    self.cursor.execute(f"ROLLBACK TO {savepoint}")
+                    self.cursor.execute(f"RELEASE {savepoint}")
+                raise
+            else:
+                self._transaction_depth -= 1
+                if depth == 0:
+                    self._transaction_thread = None
+                    self.connection.commit()
+                else:
+                    self.cursor.execute(f"RELEASE {savepoint}")
 
     def execute_query_and_commit(self, query, params=()):
-        """Выполняет запрос и сохраняет изменения"""
-        if not self.is_connected():
-            raise sqlite3.ProgrammingError("Database connection is closed")
-        self.cursor.execute(query, params)
-        self.connection.commit()
+        """
+        Выполняет запрос и сохраняет изменения (внутри transaction() - без коммита).
+        Возвращает id последней вставленной строки.
+        """
+        with self.lock:
+            if not self.is_connected():
+                raise sqlite3.ProgrammingError("Database connection is closed")
+            try:
+                self.cursor.execute(query, params)
+            except sqlite3.Error:
+                # Вне transaction() не оставляем открытую неявную транзакцию
+                if self._transaction_depth == 0:
+                    self.connection.rollback()
+                raise
+            if self._transaction_depth == 0:
+                self.connection.commit()
+            return self.cursor.lastrowid
+
+    def execute_many_and_commit(self, query, seq_of_params):
+        """
+        Выполняет запрос для каждого набора параметров (executemany) и сохраняет изменения.
+        Возвращает количество изменённых строк.
+        """
+        with self.lock:
+            if not self.is_connected():
+                raise sqlite3.ProgrammingError("Database connection is closed")
+            try:
+                self.cursor.executemany(query, seq_of_params)
+            except sqlite3.Error:
+                if self._transaction_depth == 0:
+                    self.connection.rollback()
+                raise
+            if self._transaction_depth == 0:
+                self.connection.commit()
+            return self.cursor.rowcount
+
+    def iter_rows(self, query, params=(), batch_size=1000):
+        """
+        Отдаёт строки результата по одной, подгружая их пачками через fetchmany,
+        чтобы большие выборки не занимали память целиком.
+        """
+        connection = self._get_read_connection()
+        if connection is not None:
+            cursor = connection.execute(query, params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        return
+                    yield from rows
+            finally:
+                cursor.close()
+
+        # Читаем через писателя: свой курсор, замок берём только на время fetchmany
+        with self.lock:
+            cursor = self.connection.cursor()
+            cursor.execute(query, params)
+        try:
+            while True:
+                with self.lock:
+                    rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
 
     def fetch_all(self, query, params=()):
         """Функция которая выполняет запросы обычно типа GET и ловит все элементы"""
-        self.cursor.execute(query, params)
-        return self.cursor.fetchall()
+        connection = self._get_read_connection()
+        if connection is not None:
+            return connection.execute(query, params).fetchall()
+
+        with self.lock:
+            self.cursor.execute(query, params)
+            return self.cursor.fetchall()
 
     def getter_for_one(self, query, params=()):
         """Функция схожая по функционалу с fetch_all, но для одного ряда"""
-        row = self.cursor.execute(query, params).fetchone()
+        connection = self._get_read_connection()
+        if connection is not None:
+            cursor = connection.execute(query, params)
+            row = cursor.fetchone()
+            # Закрываем курсор сразу, чтобы не держать открытой транзакцию чтения
+            cursor.close()
+        else:
+            with self.lock:
+                row = self.cursor.execute(query, params).fetchone()
         if row is None:
             return None
         return dict(row)
\ No newline at end of file
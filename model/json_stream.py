@@ -0,0 +1,75 @@
+import codecs
+import json
+
+
+# Сколько байт читать с диска за раз
+READ_CHUNK_SIZE = 64 * 1024
+
+# Запись длиннее этого (в символах) не бывает - значит, в файле ошибка синтаксиса,
+# а не недочитанный объект. Без предела ошибка в начале файла подгрузила бы в буфер весь файл
+MAX_RECORD_SIZE = 1024 * 1024
+
+
+def iter_json_records(file, chunk_size=READ_CHUNK_SIZE, max_record_size=MAX_RECORD_SIZE):
+    """
+    Потоково читает объекты из бинарного файла, не загружая его целиком.
+
+    Понимает обычный JSON-массив объектов ([{...}, {...}]) и JSON Lines
+    (по объекту на строку). Прогресс по файлу вызывающий берёт из file.tell():
+    для .gz это сжатые байты, которые и сравниваются с размером файла.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    position = 0
+    eof = False
+    in_array = None
+
+    def read_more():
+        nonlocal buffer, position, eof
+        # Отбрасываем уже разобранную часть, чтобы буфер не рос вместе с файлом
+        buffer = buffer[position:]
+        position = 0
+        data = file.read(chunk_size)
+        if not data:
+            eof = True
+            buffer += utf8.decode(b"", final=True)
+            return
+        buffer += utf8.decode(data)
+
+    while True:
+        # Пропускаем пробелы и разделители между объектами
+        while True:
+            while position < len(buffer) and (buffer[position].isspace() or
+                                              (in_array and buffer[position] == ",")):
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            read_more()
+
+        if position >= len(buffer):
+            if in_array:
+                raise json.JSONDecodeError("Массив не закрыт", buffer, position)
+            return
+
+        char = buffer[position]
+        if in_array is None:
+            # По первому символу понимаем формат файла
+            in_array = char == "["
+            if in_array:
+                position += 1
+                continue
+        elif in_array and char == "]":
+            return
+
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof or len(buffer) - position > max_record_size:
+                raise
+            # Объект ещё не дочитан целиком - подгружаем следующий кусок
+            read_more()
+            continue
+
+        position = end
+        yield record
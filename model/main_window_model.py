@@ -1,73 +1,126 @@
-from datetime import date, datetime
+from collections import OrderedDict
+from datetime import date, timedelta
+from .json_stream import iter_json_records
+from .bitmap import HabitBitmap
+from .config import DEFAULT_CONFIG
+import csv
+import gzip
 import json
+import os
+import threading
 
 
 class MainWindowModel:
     """Модель главного окна для работы с привычками"""
 
-    def __init__(self, data, user_id):
+    # Сколько старых строк habit_progress удалять за одну транзакцию при смене дня
+    RESET_BATCH_SIZE = 2000
+    # Меньше месяца сырых дней хранить нельзя: на них строятся графики за 7 и 30 дней
+    MIN_RAW_DAYS = 31
+    # Сколько столбиков максимум на графике: длиннее - переходим на недели, потом на месяцы
+    MAX_DAY_BARS = 92
+    MAX_WEEK_BARS = 105
+    # Сколько готовых рядов статистики держать в памяти (LRU)
+    STATS_CACHE_SIZE = 128
+    # Сколько привычек вставлять одним executemany при импорте
+    IMPORT_CHUNK_SIZE = 1000
+    # Колонки CSV-экспорта: общие для всех типов записей, лишние остаются пустыми
+    EXPORT_CSV_FIELDS = [
+        "type", "name", "category", "daily_frequency", "created_at",
+        "day", "date", "progress", "target", "marks", "completed",
+    ]
+
+    def __init__(self, data, user_id, retention=None):
         self.db = data
         self.user_id = user_id
+        # Сроки хранения истории (секция "retention" в config.json)
+        self.retention = dict(DEFAULT_CONFIG["retention"])
+        self.retention.update(retention or {})
         # Сохраняем дату последней проверки
         self.last_check_date = None  
+        # Кэш привычек пользователя: имя -> id и id -> строка habits.
+        # Загружается один раз за сессию и правится всеми методами, меняющими привычки.
+        # Им тоже пользуются и GUI-поток, и фоновый поток БД, поэтому под замком
+        self._habit_ids = None
+        self._habit_rows = {}
+        self._habit_lock = threading.RLock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # LRU-кэш статистики: (habit_id, начало, конец, детализация) -> результат.
+        # Им пользуются и GUI-поток, и фоновый поток БД, поэтому под замком
+        self._stats_cache = OrderedDict()
+        self._stats_lock = threading.Lock()
+        self.stats_hits = 0
+        self.stats_misses = 0
         
-        if self.today_is_new_day():
-            self.reset_daily_progress()
-        self.cleanup_old_monthly_progress()
+        self.rollover_if_new_day()
 
     def add_habit(self, name, category, frequency):
         params = (self.user_id, name, category, frequency)
-        self.db.execute_query_and_commit(self.db.INSERT_HABIT_QUERY, params)
-        habit_id = self.get_habit_id(name)
+        # Привычка и её записи прогресса добавляются одной транзакцией
+        with self.db.transaction():
+            habit_id = self.db.execute_query_and_commit(self.db.INSERT_HABIT_QUERY, params)
 
-        progress_params = (habit_id, 0, frequency)
-        self.db.execute_query_and_commit(self.db.ADD_HABIT_PROGRESS, progress_params)
+            progress_params = (habit_id, 0, frequency)
+            self.db.execute_query_and_commit(self.db.ADD_HABIT_PROGRESS, progress_params)
 
-        # Добавляем запись в monthly, только если её нет
-        exists = self.db.getter_for_one(self.db.CHECK_IF_TODAY_MONTHLY_EXISTS, (habit_id,))
-        if not exists:
+            # Добавляем запись в monthly, только если её нет (ON CONFLICT DO NOTHING)
             monthly_params = (habit_id, 0)
             self.db.execute_query_and_commit(self.db.ADD_MONTHLY_PROGRESS, monthly_params)
 
+        # В кэш только после успешного коммита
+        self._cache_habit({
+            "id": habit_id,
+            "user_id": self.user_id,
+            "name": name,
+            "category": category,
+            "daily_frequency": frequency,
+            "created_at": date.today().isoformat(),
+        })
+
     def get_habits(self):
         """Возвращает привычки и категории"""
         params = (self.user_id,)
         return self.db.fetch_all(self.db.SELECT_HABITS_QUERY, params)
 
+    def get_habits_with_progress(self):
+        """
+        Возвращает привычки вместе с (progress, target) за сегодня одним запросом.
+        Если за сегодня записей нет, progress = 0, а target берётся из daily_frequency.
+        """
+        params = (self.user_id,)
+        return self.db.fetch_all(self.db.SELECT_HABITS_WITH_TODAY_PROGRESS, params)
+
+    def get_habit_with_progress(self, habit_name):
+        """Одна привычка в том же виде, что и в get_habits_with_progress (или None)"""
+        params = (self.user_id, habit_name)
+        return self.db.getter_for_one(self.db.SELECT_HABIT_WITH_TODAY_PROGRESS, params)
+
     def toggle_mark_habit(self, habit_name):
         """
-        Добавляет новую строку в habit_progress и увеличивает progress на +1
-        относительно последнего значения за сегодня.
-        Если цель достигнута — отмечает completed = 1 в habits_progress_monthly.
+        Увеличивает progress за сегодня на +1 (одна строка на привычку и день).
+        Счётчик дня копируется в habits_progress_monthly, при достижении цели там ставится completed = 1.
         """
         habit_id = self.get_habit_id(habit_name)
         if not habit_id:
             return
 
-        # Получаем последнюю запись за сегодня
-        last_row = self.db.getter_for_one(self.db.GET_LAST_TODAY_PROGRESS, (habit_id,))
-
         # Получаем целевой daily_frequency
-        target_row = self.db.getter_for_one(self.db.GET_HABIT_TARGET, (habit_id,))
-        target = target_row["daily_frequency"] if target_row else 1
-
-        if last_row:
-            new_progress = last_row["progress"] + 1
-        else:
-            new_progress = 1  # если сегодня нет записей, начинаем с 1
-
-        # Добавляем новую строку с текущим временем
-        params = (habit_id, new_progress, target)
-
-        self.db.execute_query_and_commit(self.db.ADD_HABIT_PROGRESS, params)
-
-        # Если достигнута цель — обновляем/добавляем запись в monthly
-        if new_progress >= target:
-            exists = self.db.getter_for_one(self.db.CHECK_IF_TODAY_MONTHLY_EXISTS, (habit_id,))
-            if exists:
-                self.db.execute_query_and_commit(self.db.UPDATE_LAST_HABIT_PROGRESS_MONTHLY, (1, habit_id))
-            else:
-                self.db.execute_query_and_commit(self.db.ADD_MONTHLY_PROGRESS, (habit_id, 1))
+        target = self.get_habit_target(habit_id)
+
+        with self.db.transaction():
+            self.db.execute_query_and_commit(self.db.MARK_HABIT_PROGRESS, (habit_id, target))
+            row = self.db.getter_for_one(self.db.GET_LAST_TODAY_PROGRESS, (habit_id,))
+            new_progress = row["progress"] if row else 1
+
+            # Счётчик нужен в monthly для агрегатов, completed - если достигнута цель
+            completed = 1 if new_progress >= target else 0
+            self.db.execute_query_and_commit(self.db.MARK_MONTHLY_PROGRESS, (habit_id, new_progress, completed))
+            # Серия - одна строка по первичному ключу, без чтения истории
+            if completed:
+                self.db.execute_query_and_commit(self.db.MARK_STREAK_DAY, (habit_id,))
+                self._set_bitmap_day(habit_id, date.today())
+        self.invalidate_habit_stats(habit_id)
 
     def get_progress_and_target(self, habit_name: str) -> tuple:
         """
@@ -83,9 +136,7 @@ class MainWindowModel:
             return row["progress"], row["target"]
 
         # Если записей нет — возвращаем 0 и target из таблицы habits
-        tgt_row = self.db.getter_for_one(self.db.GET_HABIT_TARGET, (habit_id,))
-        target = tgt_row['daily_frequency'] if tgt_row else 1
-        return 0, target
+        return 0, self.get_habit_target(habit_id)
 
     def get_categories(self):
         """Возвращает все категории, которые существуют"""
@@ -97,9 +148,16 @@ class MainWindowModel:
         """Удаляет привычку"""
         habit_id = self.get_habit_id(habit_name)
         params = (self.user_id, habit_name)
-        self.db.execute_query_and_commit(self.db.DELETE_HABIT_PROGRESS, (habit_id,))
-        self.db.execute_query_and_commit(self.db.DELETE_HABIT_PROGRESS_MONTHLY_QUERY, (habit_id,))
-        self.db.execute_query_and_commit(self.db.DELETE_HABIT_QUERY, params)
+        with self.db.transaction():
+            self.db.execute_query_and_commit(self.db.DELETE_HABIT_PROGRESS, (habit_id,))
+            self.db.execute_query_and_commit(self.db.DELETE_HABIT_PROGRESS_MONTHLY_QUERY, (habit_id,))
+            self.db.execute_query_and_commit(self.db.DELETE_HABIT_ROLLUP_WEEKLY, (habit_id,))
+            self.db.execute_query_and_commit(self.db.DELETE_HABIT_ROLLUP_MONTHLY, (habit_id,))
+            self.db.execute_query_and_commit(self.db.DELETE_HABIT_STREAK, (habit_id,))
+            self.db.execute_query_and_commit(self.db.DELETE_HABIT_BITMAP, (habit_id,))
+            self.db.execute_query_and_commit(self.db.DELETE_HABIT_QUERY, params)
+        self._uncache_habit(habit_name)
+        self.invalidate_habit_stats(habit_id)
 
     def is_habit_completed_today(self, habit_name):
         habit_id = self.get_habit_id(habit_name)
@@ -112,17 +170,151 @@ class MainWindowModel:
         return False
 
     def reset_daily_progress(self):
-        """Сбрасывает ежедневный прогресс для всех привычек"""
-        self.db.execute_query_and_commit(self.db.RESET_DAILY_PROGRESS)
-        self.init_new_progress_for_habits()
+        """
+        Сбрасывает ежедневный прогресс привычек пользователя.
+        Старые строки удаляются пачками в коротких транзакциях, поэтому время
+        входа не зависит от размера общей базы. Отметка last_rollover ставится
+        последней: если процесс прервётся, при следующем входе сброс продолжится.
+        """
+        params = (self.user_id, self.RESET_BATCH_SIZE)
+        while True:
+            with self.db.transaction():
+                self.db.execute_query_and_commit(self.db.RESET_DAILY_PROGRESS, params)
+                deleted = self.db.cursor.rowcount
+            if deleted < self.RESET_BATCH_SIZE:
+                break
+
+        with self.db.transaction():
+            self.init_new_progress_for_habits()
+            self.db.execute_query_and_commit(self.db.BREAK_STALE_STREAKS, (self.user_id,))
+            self.db.execute_query_and_commit(self.db.SET_LAST_ROLLOVER, (self.user_id,))
         # Обновляем дату последней проверки
         self.last_check_date = date.today()
 
     def get_habit_id(self, habit_name):
-        """Получает ID привычки по её названию"""
+        """Получает ID привычки по её названию (сначала из кэша)"""
+        # Замок держим только на время работы со словарями, не во время запросов к БД:
+        # иначе поток с открытой transaction() и поток, загружающий кэш, ждали бы друг друга
+        with self._habit_lock:
+            habit_ids = self._habit_ids
+        if habit_ids is None:
+            habit_ids = self._load_habit_cache()
+
+        with self._habit_lock:
+            habit_id = habit_ids.get(habit_name)
+            if habit_id is not None:
+                self.cache_hits += 1
+                return habit_id
+            self.cache_misses += 1
+
+        # Промах: привычки может не быть вовсе, но на всякий случай спросим БД
         params = (self.user_id, habit_name)
         row = self.db.getter_for_one(self.db.GET_HABIT_ID_QUERY, params)
-        return row['id'] if row else None
+        if not row:
+            return None
+        with self._habit_lock:
+            # Пока спрашивали БД, кэш могли сбросить - тогда он сам перезагрузится
+            if self._habit_ids is not None:
+                self._habit_ids[habit_name] = row['id']
+        return row['id']
+
+    def get_habit_target(self, habit_id):
+        """Возвращает daily_frequency привычки (из кэша, если она там есть)"""
+        with self._habit_lock:
+            habit = self._habit_rows.get(habit_id)
+            if habit is not None:
+                self.cache_hits += 1
+                return habit["daily_frequency"]
+            self.cache_misses += 1
+
+        row = self.db.getter_for_one(self.db.GET_HABIT_TARGET, (habit_id,))
+        return row["daily_frequency"] if row else 1
+
+    def get_cache_stats(self):
+        """Статистика кэшей привычек и статистики для диагностики"""
+        with self._habit_lock:
+            habit_cache_size = len(self._habit_ids) if self._habit_ids is not None else 0
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "size": habit_cache_size,
+            "stats_hits": self.stats_hits,
+            "stats_misses": self.stats_misses,
+            "stats_size": len(self._stats_cache),
+        }
+
+    def _stats_cache_get(self, key):
+        """Результат из LRU-кэша статистики или None"""
+        with self._stats_lock:
+            value = self._stats_cache.get(key)
+            if value is None:
+                self.stats_misses += 1
+                return None
+            self._stats_cache.move_to_end(key)
+            self.stats_hits += 1
+            return value
+
+    def _stats_cache_put(self, key, value):
+        with self._stats_lock:
+            self._stats_cache[key] = value
+            self._stats_cache.move_to_end(key)
+            while len(self._stats_cache) > self.STATS_CACHE_SIZE:
+                self._stats_cache.popitem(last=False)
+
+    def invalidate_habit_stats(self, habit_id):
+        """Удаляет из кэша статистики все ряды одной привычки"""
+        with self._stats_lock:
+            for key in [key for key in self._stats_cache if key[0] == habit_id]:
+                del self._stats_cache[key]
+
+    def clear_stats_cache(self):
+        with self._stats_lock:
+            self._stats_cache.clear()
+
+    def _load_habit_cache(self, habits=None):
+        """Заполняет кэш из списка привычек (или одним запросом к БД). Возвращает словарь имя -> id"""
+        if habits is None:
+            habits = self.get_habits()
+        habit_rows = {habit["id"]: dict(habit) for habit in habits}
+        habit_ids = {habit["name"]: habit_id for habit_id, habit in habit_rows.items()}
+        with self._habit_lock:
+            self._habit_ids = habit_ids
+            self._habit_rows = habit_rows
+        return habit_ids
+
+    def _cache_habit(self, habit):
+        with self._habit_lock:
+            if self._habit_ids is None:
+                # Кэш ещё не загружен - целиком подтянется при первом обращении
+                return
+            self._habit_ids[habit["name"]] = habit["id"]
+            self._habit_rows[habit["id"]] = habit
+
+    def _uncache_habit(self, habit_name):
+        with self._habit_lock:
+            if self._habit_ids is None:
+                return
+            habit_id = self._habit_ids.pop(habit_name, None)
+            self._habit_rows.pop(habit_id, None)
+
+    def _invalidate_habit_cache(self):
+        """Сбрасывает кэш, он перезагрузится при следующем обращении"""
+        with self._habit_lock:
+            self._habit_ids = None
+            self._habit_rows = {}
+
+    def rollover_if_new_day(self):
+        """
+        Выполняет переход на новый день, если он наступил.
+        Вызывается при входе и по таймеру в полночь. Возвращает True, если переход был.
+        """
+        if not self.today_is_new_day():
+            return False
+        self.reset_daily_progress()
+        self.apply_retention()
+        # Сменилось "сегодня", серии и агрегаты у всех привычек
+        self.clear_stats_cache()
+        return True
 
     def today_is_new_day(self):
         """Проверяет, является ли сегодня новым днём для сброса прогресса"""
@@ -131,141 +323,318 @@ class MainWindowModel:
         # Если уже проверяли сегодня, возвращаем False
         if self.last_check_date == today:
             return False
-        
-        # Проверяем, есть ли записи за сегодня в habit_progress
-        # Если есть хоть одна запись с сегодняшней датой, значит день уже начат
-        check_query = """
-            SELECT COUNT(*) as count
-            FROM habit_progress hp
-            JOIN habits h ON hp.habit_id = h.id
-            WHERE h.user_id = ? 
-            AND date(hp.date) = date('now', 'localtime')
-        """
-        
-        result = self.db.getter_for_one(check_query, (self.user_id,))
-        
-        if result and result['count'] > 0:
-            # Есть записи за сегодня - день уже начат
+
+        # Новый день - если переход для пользователя ещё не делали сегодня
+        row = self.db.getter_for_one(self.db.GET_LAST_ROLLOVER, (self.user_id,))
+        last_rollover = row["last_rollover"] if row else None
+        if last_rollover and last_rollover >= today.isoformat():
             self.last_check_date = today
             return False
-        
-        # Проверяем last_login пользователя
-        params = (self.user_id,)
-        row = self.db.getter_for_one(self.db.GET_LAST_DATE_QUERY, params)
-        
-        if row and row['date']:
-            try:
-                # Парсим дату последнего входа
-                last_date_str = row['date']
-                # Может быть в формате 'YYYY-MM-DD' или 'YYYY-MM-DD HH:MM:SS'
-                if ' ' in last_date_str:
-                    last_date = datetime.strptime(last_date_str, "%Y-%m-%d %H:%M:%S").date()
-                else:
-                    last_date = datetime.strptime(last_date_str, "%Y-%m-%d").date()
-                
-                # Если последний вход был НЕ сегодня - это новый день
-                if last_date < today:
-                    self.last_check_date = today
-                    return True
-                    
-            except (ValueError, TypeError) as e:
-                print(f"Ошибка парсинга даты: {e}")
-                # В случае ошибки считаем что это новый день
-                self.last_check_date = today
-                return True
-        
-        # Если нет информации о последнем входе - считаем новым днём
-        self.last_check_date = today
         return True
 
     def init_new_progress_for_habits(self):
-        """Инициализирует новый прогресс для привычки в начале нового дня"""
-        habits_id_and_frequency = [
-            (self.get_habit_id(habit["name"]), habit["daily_frequency"])
-            for habit in self.get_habits()
-        ]
-        for habit_id, frequency in habits_id_and_frequency:
-            self.db.execute_query_and_commit(self.db.ADD_HABIT_PROGRESS, (habit_id, 0, frequency))
-
-            exists = self.db.getter_for_one(self.db.CHECK_IF_TODAY_MONTHLY_EXISTS, (habit_id,))
-            if not exists:
-                self.db.execute_query_and_commit(self.db.ADD_MONTHLY_PROGRESS, (habit_id, 0))
+        """
+        Инициализирует новый прогресс для всех привычек в начале нового дня.
+        Два INSERT ... SELECT в одной транзакции, уже существующие дни пропускаются.
+        """
+        params = (self.user_id,)
+        with self.db.transaction():
+            self.db.execute_query_and_commit(self.db.INIT_TODAY_PROGRESS_FOR_USER, params)
+            self.db.execute_query_and_commit(self.db.INIT_TODAY_MONTHLY_FOR_USER, params)
 
     def get_habit_static_daily(self, habit_name):
         habit_id = self.get_habit_id(habit_name)
         if not habit_id:
             return []
 
-        progress = self.get_progress_and_target(habit_name)[0]
-
-        if progress <= 0:
-            return []
+        today = date.today().isoformat()
+        key = (habit_id, today, today, "hour")
+        cached = self._stats_cache_get(key)
+        if cached is not None:
+            return cached
 
+        # Отметки за сегодня лежат в marks, отдельная проверка progress не нужна
         params = (habit_id,)
-        rows = self.db.fetch_all(self.db.GET_DAILY_PROGRESS, params)
-        return [(row['date'], 1) for row in rows if row and int(row["progress"]) > 0]
+        row = self.db.getter_for_one(self.db.GET_DAILY_PROGRESS, params)
+        if not row or not row["marks"] or row["progress"] <= 0:
+            marks = []
+        else:
+            # marks - времена отметок через запятую, по одной точке на отметку
+            marks = [(f"{row['day']} {mark}", 1) for mark in row["marks"].split(",")]
+        self._stats_cache_put(key, marks)
+        return marks
 
     def reset_data(self):
         params = (self.user_id,)
-        self.db.execute_query_and_commit(self.db.DELETE_HABITS, params)
-        self.db.execute_query_and_commit(self.db.DELETE_HABIT_PROGRESS, params)
-        self.db.execute_query_and_commit(self.db.DELETE_HABIT_PROGRESS_MONTHLY_QUERY, params)
+        # Сначала прогресс (он ищется через habits), потом сами привычки
+        with self.db.transaction():
+            self.db.execute_query_and_commit(self.db.DELETE_USER_HABITS_PROGRESS, params)
+            self.db.execute_query_and_commit(self.db.DELETE_USER_HABITS_PROGRESS_MONTHLY, params)
+            self.db.execute_query_and_commit(self.db.DELETE_USER_ROLLUP_WEEKLY, params)
+            self.db.execute_query_and_commit(self.db.DELETE_USER_ROLLUP_MONTHLY, params)
+            self.db.execute_query_and_commit(self.db.DELETE_USER_STREAKS, params)
+            self.db.execute_query_and_commit(self.db.DELETE_USER_BITMAPS, params)
+            self.db.execute_query_and_commit(self.db.DELETE_HABITS, params)
+            self.db.execute_query_and_commit(self.db.RESET_LAST_ROLLUP_DAY, params)
+        # Привычек больше нет - кэш загружен и пуст
+        self._load_habit_cache([])
+        self.clear_stats_cache()
 
     def get_habit_static_for_N_days(self, habit_name, days):
         """
-        Возвращает [(дата, выполнено)] за последние N дней
+        Возвращает (детализация, [(начало периода, доля выполнения)]) за последние N дней
         """
-        habit_id = self.get_habit_id(habit_name)
-        if not habit_id:
-            return []
-
         try:
-            days = int(days)
+            days = max(int(days), 1)
         except ValueError:
             days = 7
 
-        params = (habit_id, days)
-        rows = self.db.fetch_all(self.db.GET_HABIT_STATISTIC_FOR_N_DAYS, params)
+        today = date.today()
+        return self.get_habit_statistics(habit_name, today - timedelta(days=days - 1), today)
 
-        if not rows:
-            return []
+    def get_habit_streak(self, habit_name):
+        """Возвращает (текущая серия, рекорд) в днях"""
+        habit_id = self.get_habit_id(habit_name)
+        if not habit_id:
+            return 0, 0
+
+        key = (habit_id, None, None, "streak")
+        cached = self._stats_cache_get(key)
+        if cached is not None:
+            return cached
+
+        row = self.db.getter_for_one(self.db.GET_HABIT_STREAK, (habit_id,))
+        streak = (row["current"], row["best"]) if row else (0, 0)
+        self._stats_cache_put(key, streak)
+        return streak
+
+    def rebuild_streaks(self):
+        """
+        Пересчитывает серии всех привычек пользователя по битовым полям.
+        В habits_progress_monthly старые дни удаляются по сроку хранения,
+        а в поле остаются, поэтому серия длиннее raw_days не укорачивается
+        """
+        today = date.today()
+        streaks = []
+        for row in self.db.fetch_all(self.db.GET_USER_BITMAPS, (self.user_id,)):
+            bitmap = HabitBitmap.from_blob(row["start_day"], row["bits"])
+            last_day = bitmap.last_day()
+            if last_day is None:
+                continue
+            streaks.append((row["id"], bitmap.current_streak(today), bitmap.best_streak(), last_day.isoformat()))
+        self.db.execute_many_and_commit(self.db.SAVE_HABIT_STREAK, streaks)
+        self.clear_stats_cache()
+
+    def get_habit_bitmap(self, habit_name):
+        """Вся история выполнения привычки как HabitBitmap (пустая, если выполнений не было)"""
+        habit_id = self.get_habit_id(habit_name)
+        if not habit_id:
+            return HabitBitmap()
+        return self._load_bitmap(habit_id)
+
+    def get_habit_history_summary(self, habit_name):
+        """
+        Итоги за всю историю по битовому полю (старые дни в нём не удаляются по сроку хранения):
+        {"rate": доля дней с выполненной целью с первого выполнения, "weekdays": [пн..вс]}.
+        None, если привычку ещё ни разу не выполняли
+        """
+        habit_id = self.get_habit_id(habit_name)
+        if not habit_id:
+            return None
+
+        key = (habit_id, None, None, "history")
+        cached = self._stats_cache_get(key)
+        if cached is not None:
+            return cached
+
+        bitmap = self._load_bitmap(habit_id)
+        if bitmap.start_day is None:
+            return None
+        summary = {
+            "rate": bitmap.rate(bitmap.start_day, date.today()),
+            "weekdays": bitmap.weekday_counts(),
+        }
+        self._stats_cache_put(key, summary)
+        return summary
+
+    def get_all_bitmaps(self):
+        """{имя привычки: HabitBitmap} для всех привычек пользователя одним запросом"""
+        rows = self.db.fetch_all(self.db.GET_USER_BITMAPS, (self.user_id,))
+        return {row["name"]: HabitBitmap.from_blob(row["start_day"], row["bits"]) for row in rows}
+
+    def _load_bitmap(self, habit_id):
+        row = self.db.getter_for_one(self.db.GET_HABIT_BITMAP, (habit_id,))
+        if not row:
+            return HabitBitmap()
+        return HabitBitmap.from_blob(row["start_day"], row["bits"])
+
+    def _set_bitmap_day(self, habit_id, day):
+        """Ставит бит дня. Поле - сотни байт, так что чтение и запись целиком дешевле отдельной логики"""
+        bitmap = self._load_bitmap(habit_id)
+        if bitmap.is_set(day):
+            return
+        bitmap.set_day(day)
+        params = (habit_id, bitmap.start_day.isoformat(), bitmap.to_blob())
+        self.db.execute_query_and_commit(self.db.SAVE_HABIT_BITMAP, params)
 
-        return [(row["date"], row["completed"]) for row in rows]
+    def choose_granularity(self, start, end):
+        """
+        Выбирает детализацию графика: "day", "week" или "month".
+        Смотрит на длину периода и на то, хранятся ли ещё для него подневные/недельные данные.
+        """
+        today = date.today()
+        span = (end - start).days + 1
+        raw_days = max(int(self.retention["raw_days"]), self.MIN_RAW_DAYS)
+        weekly_days = max(int(self.retention["weekly_days"]), raw_days)
 
-    def cleanup_old_monthly_progress(self):
-        """Удаляет записи старше 30 дней из таблицы habits_progress_monthly"""
-        self.db.execute_query_and_commit(self.db.DELETE_OLD_MONTHLY_PROGRESS)
+        if span <= self.MAX_DAY_BARS and start >= today - timedelta(days=raw_days):
+            return "day"
+        if span <= self.MAX_WEEK_BARS * 7 and start >= today - timedelta(days=weekly_days):
+            return "week"
+        return "month"
 
-    def import_habits(self, file_path):
-        """Импортирует привычки из JSON файла, пропуская дубликаты"""
+    def get_habit_statistics(self, habit_name, start, end):
+        """
+        Статистика привычки за период [start, end] (date или 'YYYY-MM-DD').
+        Возвращает (детализация, [(начало периода, доля дней с выполненной целью)]).
+        Длинные периоды читаются из агрегатов, так что даже за несколько лет
+        запрос отдаёт не больше пары сотен строк.
+        """
+        if isinstance(start, str):
+            start = date.fromisoformat(start)
+        if isinstance(end, str):
+            end = date.fromisoformat(end)
+        if start > end:
+            start, end = end, start
+        end = min(end, date.today())
+
+        granularity = self.choose_granularity(start, end)
+        habit_id = self.get_habit_id(habit_name)
+        if not habit_id:
+            return granularity, []
+
+        key = (habit_id, start.isoformat(), end.isoformat(), granularity)
+        cached = self._stats_cache_get(key)
+        if cached is not None:
+            return granularity, cached
+
+        if granularity == "day":
+            params = (habit_id, start.isoformat(), end.isoformat())
+            rows = self.db.fetch_all(self.db.STATS_BY_DAY, params)
+        else:
+            if granularity == "week":
+                query = self.db.STATS_BY_WEEK
+                first_period = start - timedelta(days=start.weekday())
+            else:
+                query = self.db.STATS_BY_MONTH
+                first_period = start.replace(day=1)
+            params = (
+                habit_id, first_period.isoformat(), end.isoformat(),
+                habit_id, start.isoformat(), end.isoformat(),
+                self.user_id,
+            )
+            rows = self.db.fetch_all(query, params)
+
+        series = [(row["period"], row["value"]) for row in rows]
+        self._stats_cache_put(key, series)
+        return granularity, series
+
+    def rollup_history(self):
+        """
+        Досуммирует завершённые дни в недельные и месячные агрегаты.
+        Учитываются только дни после last_rollup_day, так что работа не растёт с историей.
+        """
+        params = (self.user_id,)
+        with self.db.transaction():
+            row = self.db.getter_for_one(self.db.GET_LAST_ROLLUP_DAY, params)
+            last_rollup_day = row["last_rollup_day"] if row else ""
+            rollup_params = (self.user_id, last_rollup_day)
+            self.db.execute_query_and_commit(self.db.ROLLUP_WEEKLY, rollup_params)
+            self.db.execute_query_and_commit(self.db.ROLLUP_MONTHLY, rollup_params)
+            self.db.execute_query_and_commit(self.db.SET_LAST_ROLLUP_DAY, params)
+
+    def apply_retention(self):
+        """
+        Сворачивает новые дни в агрегаты и удаляет то, что старше сроков из self.retention.
+        Сырые дни удаляются пачками и только после того, как попали в агрегаты.
+        """
+        self.rollup_history()
+
+        raw_days = max(int(self.retention["raw_days"]), self.MIN_RAW_DAYS)
+        weekly_days = max(int(self.retention["weekly_days"]), raw_days)
+        purge_params = (self.user_id, raw_days, self.user_id, self.RESET_BATCH_SIZE)
+        while True:
+            with self.db.transaction():
+                self.db.execute_query_and_commit(self.db.PURGE_OLD_MONTHLY_PROGRESS, purge_params)
+                deleted = self.db.cursor.rowcount
+            if deleted < self.RESET_BATCH_SIZE:
+                break
+
+        self.db.execute_query_and_commit(self.db.PURGE_OLD_WEEKLY_ROLLUP, (self.user_id, weekly_days))
+
+    def import_habits(self, file_path, progress_callback=None):
+        """
+        Импортирует привычки из JSON файла (массив или JSON Lines, можно .gz), пропуская дубликаты.
+        Файл читается потоково, привычки вставляются пачками по IMPORT_CHUNK_SIZE
+        через executemany, каждая пачка - своя транзакция.
+        progress_callback(прочитано_байт, всего_байт) вызывается после каждой пачки.
+        """
         try:
-            with open(file_path, 'r', encoding="utf-8") as file:
-                habits = json.load(file)
-            
+            total_bytes = os.path.getsize(file_path)
             imported_count = 0
             skipped_count = 0
-            
-            for habit in habits:
-                # Проверяем, существует ли уже привычка с таким именем
-                if not self.get_habit_id(habit["name"]):
-                    try:
-                        params = (
-                            self.user_id, 
-                            habit["name"], 
-                            habit["category"], 
-                            habit["daily_frequency"], 
-                            habit["created_at"]
-                        )
-                        self.db.execute_query_and_commit(
-                            self.db.INSERT_IMPORTED_HABIT, 
-                            params
-                        )
-                        imported_count += 1
-                    except Exception as e:
-                        print(f"Ошибка при импорте '{habit['name']}': {e}")
+
+            # Имена, которые уже есть у пользователя или встретились выше в файле
+            with self._habit_lock:
+                habit_ids = self._habit_ids
+            if habit_ids is None:
+                habit_ids = self._load_habit_cache()
+            with self._habit_lock:
+                known_names = set(habit_ids)
+            chunk = []
+
+            def flush(bytes_read):
+                nonlocal imported_count, skipped_count
+                if chunk:
+                    with self.db.transaction():
+                        # INSERT OR IGNORE страхует от дублей, которых нет в кэше
+                        inserted = self.db.execute_many_and_commit(self.db.INSERT_IMPORTED_HABIT, chunk)
+                    imported_count += inserted
+                    skipped_count += len(chunk) - inserted
+                    chunk.clear()
+                if progress_callback:
+                    progress_callback(bytes_read, total_bytes)
+
+            # Размер сжатого файла тоже считаем по прочитанным сжатым байтам
+            with open(file_path, 'rb') as raw_file:
+                file = gzip.GzipFile(fileobj=raw_file) if file_path.lower().endswith(".gz") else raw_file
+                for habit in iter_json_records(file):
+                    if not isinstance(habit, dict):
+                        raise ValueError("Неверный формат JSON файла")
+                    # В полном экспорте (.jsonl) кроме привычек есть записи истории
+                    if habit.get("type", "habit") != "habit":
+                        continue
+
+                    # Проверяем, существует ли уже привычка с таким именем
+                    if habit["name"] in known_names:
                         skipped_count += 1
-                else:
-                    skipped_count += 1
+                        continue
+                    known_names.add(habit["name"])
+                    chunk.append((
+                        self.user_id,
+                        habit["name"],
+                        habit["category"],
+                        habit["daily_frequency"],
+                        habit["created_at"]
+                    ))
+                    if len(chunk) >= self.IMPORT_CHUNK_SIZE:
+                        flush(raw_file.tell())
+                flush(total_bytes)
+
+            # Новые привычки подтянутся в кэш при следующем обращении.
+            # Кэш статистики не трогаем: импорт только добавляет привычки с новыми id
+            if imported_count:
+                self._invalidate_habit_cache()
             
             return imported_count, skipped_count
             
@@ -275,26 +644,63 @@ class MainWindowModel:
             raise ValueError("Неверный формат JSON файла")
         except KeyError as e:
             raise ValueError(f"В файле отсутствует обязательное поле: {e}")
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Ошибка при импорте: {e}")
 
     def export_habits(self, file_path):
+        """
+        Экспортирует данные пользователя. Формат выбирается по расширению:
+          .json  - массив привычек (как раньше, его понимает импорт);
+          .jsonl - привычки и вся история прогресса, по записи на строку;
+          .csv   - то же, что .jsonl, но таблицей.
+        Если в конце добавлено .gz (например, .jsonl.gz) - файл сжимается gzip.
+        Записи пишутся по мере чтения курсора, память не зависит от объёма истории.
+        """
         params = (self.user_id, )
-        habits = self.db.fetch_all(self.db.GET_USER_HABITS, params)
-        data = []
-        for item in habits:
-                habit_progress = self.get_progress_and_target(item["name"])
-                habit_entry = {
-                    "name": item["name"],
-                    "daily_frequency": item["daily_frequency"],
-                    "created_at": item["created_at"],
-                    "category": item["category"]
-                }
-                data.append(habit_entry)
-        with open(file_path, 'w', encoding="utf-8") as file:
-                json.dump(data, file, ensure_ascii=False, indent=4)
+        compressed = file_path.lower().endswith(".gz")
+        base_path = file_path[:-3] if compressed else file_path
+        extension = os.path.splitext(base_path)[1].lower()
+
+        opener = gzip.open if compressed else open
+        with opener(file_path, 'wt', encoding="utf-8", newline="") as file:
+            if extension == ".jsonl":
+                for record in self._iter_export_records(params):
+                    file.write(json.dumps(record, ensure_ascii=False))
+                    file.write("\n")
+            elif extension == ".csv":
+                writer = csv.DictWriter(file, fieldnames=self.EXPORT_CSV_FIELDS, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(self._iter_export_records(params))
+            else:
+                # Массив привычек пишем по одной, не собирая список в памяти
+                file.write("[")
+                for index, row in enumerate(self.db.iter_rows(self.db.GET_USER_HABITS, params)):
+                    file.write(",\n" if index else "\n")
+                    json.dump(self._habit_export_entry(row), file, ensure_ascii=False, indent=4)
+                file.write("\n]\n")
+
+    def _habit_export_entry(self, row):
+        return {
+            "name": row["name"],
+            "daily_frequency": row["daily_frequency"],
+            "created_at": row["created_at"],
+            "category": row["category"]
+        }
+
+    def _iter_export_records(self, params):
+        """Привычки, затем дневной прогресс и история выполнения, записями с полем type"""
+        for row in self.db.iter_rows(self.db.GET_USER_HABITS, params):
+            yield {"type": "habit", **self._habit_export_entry(row)}
+        for row in self.db.iter_rows(self.db.EXPORT_USER_PROGRESS, params):
+            yield {"type": "progress", **dict(row)}
+        for row in self.db.iter_rows(self.db.EXPORT_USER_MONTHLY, params):
+            yield {"type": "monthly", **dict(row)}
     
     def close(self):
         """Закрывает ресурсы модели и очищает кэш"""
         # Очищаем кэшированные данные
-        self.last_check_date = None
\ No newline at end of file
+        self.last_check_date = None
+        self._invalidate_habit_cache()
+        self.clear_stats_cache()
\ No newline at end of file
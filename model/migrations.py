@@ -0,0 +1,164 @@
+import time
+from datetime import date
+
+
+class Migrations:
+    """
+    Версионные миграции схемы БД.
+
+    Номер применённой версии хранится в PRAGMA user_version. При запуске
+    все недостающие шаги выполняются по порядку в одной транзакции:
+    либо база обновляется целиком, либо остаётся как была.
+    """
+
+    # Размер пачки при заполнении данных, чтобы не держать в памяти всю таблицу
+    BATCH_SIZE = 5000
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.cursor()
+        # Шаги миграций: (версия, описание, функция). Добавлять только в конец!
+        self.steps = [
+            (1, "day-ключ и индексы для таблиц прогресса", self._v1_progress_day_key),
+            (2, "одна строка прогресса на привычку и день", self._v2_progress_counter_per_day),
+            (3, "уникальный (habit_id, date) для habits_progress_monthly", self._v3_monthly_unique_day),
+            (4, "отметка последнего перехода на новый день у пользователя", self._v4_user_last_rollover),
+            (5, "счётчик дня в habits_progress_monthly и отметка агрегатов", self._v5_monthly_progress_rollup),
+            (6, "серии выполнения habit_streaks по сохранённой истории", self._v6_habit_streaks),
+            (7, "битовая история выполнения habit_bitmaps", self._v7_habit_bitmaps),
+        ]
+
+    def get_version(self):
+        """Возвращает текущую версию схемы"""
+        return self.cursor.execute("PRAGMA user_version").fetchone()[0]
+
+    def run(self):
+        """
+        Применяет недостающие миграции.
+        Возвращает отчёт [(версия, описание, секунды)] по выполненным шагам.
+        """
+        current = self.get_version()
+        pending = [step for step in self.steps if step[0] > current]
+        if not pending:
+            return []
+
+        report = []
+        self.cursor.execute("BEGIN")
+        try:
+            for version, description, step in pending:
+                started = time.perf_counter()
+                step()
+                # PRAGMA не принимает параметры, но версия у нас всегда int
+                self.cursor.execute(f"PRAGMA user_version = {int(version)}")
+                elapsed = time.perf_counter() - started
+                report.append((version, description, elapsed))
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+
+        for version, description, elapsed in report:
+            print(f"Миграция {version} ({description}): {elapsed:.3f} c")
+        return report
+
+    # ========== Вспомогательные методы ==========
+
+    def _column_exists(self, table, column):
+        rows = self.cursor.execute(f"PRAGMA table_info({table})").fetchall()
+        return any(row[1] == column for row in rows)
+
+    def _run_in_id_ranges(self, query, max_id_query):
+        """
+        Выполняет запрос с параметрами (от, до] по диапазонам id шириной BATCH_SIZE:
+        каждая пачка идёт по первичному ключу, без повторного просмотра обработанных строк
+        """
+        max_id = self.cursor.execute(max_id_query).fetchone()[0] or 0
+        for start in range(0, max_id, self.BATCH_SIZE):
+            self.cursor.execute(query, (start, start + self.BATCH_SIZE))
+
+    # ========== Шаги миграций ==========
+
+    def _v1_progress_day_key(self):
+        """Колонка day в habit_progress и индексы (habit_id, day) для обеих таблиц прогресса"""
+        from .database import DatabaseQueries as q
+
+        if not self._column_exists("habit_progress", "day"):
+            self.cursor.execute(q.ADD_DAY_COLUMN_TO_PROGRESS)
+            self._run_in_id_ranges(q.BACKFILL_PROGRESS_DAY, q.GET_MAX_PROGRESS_ID)
+        self.cursor.execute(q.SQL_INIT_PROGRESS_DAY_INDEX)
+        self.cursor.execute(q.SQL_INIT_MONTHLY_DAY_INDEX)
+
+    def _v2_progress_counter_per_day(self):
+        """Сжимает лог отметок habit_progress до одной строки-счётчика на привычку и день"""
+        from .database import DatabaseQueries as q
+
+        if not self._column_exists("habit_progress", "marks"):
+            self.cursor.execute(q.RENAME_PROGRESS_LOG)
+            self.cursor.execute(q.SQL_INIT_HABITS_PROGRESS_TABLE)
+            self.cursor.execute(q.COMPACT_PROGRESS_LOG)
+            self.cursor.execute(q.DROP_PROGRESS_LOG)
+        # Уникальный индекс (habit_id, day) заменяет обычный из миграции 1
+        self.cursor.execute(q.DROP_PROGRESS_DAY_INDEX)
+
+    def _v3_monthly_unique_day(self):
+        """Убирает дубли дней в habits_progress_monthly и делает индекс (habit_id, date) уникальным"""
+        from .database import DatabaseQueries as q
+
+        self.cursor.execute(q.MERGE_MONTHLY_DUPLICATES)
+        self.cursor.execute(q.DELETE_MONTHLY_DUPLICATES)
+        self.cursor.execute(q.DROP_MONTHLY_DAY_INDEX)
+        self.cursor.execute(q.SQL_INIT_MONTHLY_UNIQUE_DAY_INDEX)
+
+    def _v4_user_last_rollover(self):
+        """Колонка users.last_rollover. NULL - переход на новый день ещё не выполнялся"""
+        from .database import DatabaseQueries as q
+
+        if not self._column_exists("users", "last_rollover"):
+            self.cursor.execute(q.ADD_LAST_ROLLOVER_COLUMN)
+
+    def _v5_monthly_progress_rollup(self):
+        """Колонки habits_progress_monthly.progress и users.last_rollup_day для агрегатов истории"""
+        from .database import DatabaseQueries as q
+
+        if not self._column_exists("habits_progress_monthly", "progress"):
+            self.cursor.execute(q.ADD_MONTHLY_PROGRESS_COLUMN)
+            self._run_in_id_ranges(q.BACKFILL_MONTHLY_PROGRESS, q.GET_MAX_MONTHLY_ID)
+        if not self._column_exists("users", "last_rollup_day"):
+            self.cursor.execute(q.ADD_LAST_ROLLUP_DAY_COLUMN)
+
+    def _v6_habit_streaks(self):
+        """Заполняет habit_streaks по истории (сама таблица создаётся в _initialize_tables)"""
+        from .database import DatabaseQueries as q
+
+        user_ids = [row[0] for row in self.cursor.execute(q.GET_ALL_USER_IDS).fetchall()]
+        for user_id in user_ids:
+            self.cursor.execute(q.REBUILD_USER_STREAKS, (user_id,))
+
+    def _v7_habit_bitmaps(self):
+        """Собирает habit_bitmaps из выполненных дней habits_progress_monthly"""
+        from .database import DatabaseQueries as q
+        from .bitmap import HabitBitmap
+
+        def save(habit_id, bitmap):
+            self.cursor.execute(q.SAVE_HABIT_BITMAP, (habit_id, bitmap.start_day.isoformat(), bitmap.to_blob()))
+
+        user_ids = [row[0] for row in self.cursor.execute(q.GET_ALL_USER_IDS).fetchall()]
+        # Дни отсортированы по привычке: читаем пачками через fetchmany и в памяти
+        # держим поле только одной привычки, сохраняя его, когда привычка сменилась
+        reader = self.connection.cursor()
+        for user_id in user_ids:
+            reader.execute(q.GET_USER_COMPLETED_DAYS, (user_id,))
+            habit_id, bitmap = None, None
+            while True:
+                rows = reader.fetchmany(self.BATCH_SIZE)
+                if not rows:
+                    break
+                for row_habit_id, day in rows:
+                    if row_habit_id != habit_id:
+                        if bitmap is not None:
+                            save(habit_id, bitmap)
+                        habit_id, bitmap = row_habit_id, HabitBitmap()
+                    bitmap.set_day(date.fromisoformat(day))
+            if bitmap is not None:
+                save(habit_id, bitmap)
+        reader.close()
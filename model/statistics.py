@@ -0,0 +1,161 @@
+from datetime import date, timedelta
+import numpy as np
+
+
+# Единица datetime64 для каждой детализации графика
+DATE_UNITS = {"hour": "s", "day": "D", "week": "D", "month": "D"}
+
+# Окно скользящего среднего (в периодах графика)
+ROLLING_WINDOW = 7
+
+WEEKDAY_NAMES = ["пн", "вт", "ср", "чт", "пт", "сб", "вс"]
+
+# Тепловая карта показывает не меньше года, даже если истории меньше
+HEATMAP_MIN_DAYS = 364
+
+
+def to_arrays(rows, granularity="day"):
+    """
+    [(дата, значение)] из модели -> (datetime64-массив дат, float-массив значений).
+    Даты разбирает сам NumPy, без strptime на каждую строку.
+    """
+    if not rows:
+        return np.array([], dtype=f"datetime64[{DATE_UNITS[granularity]}]"), np.array([], dtype=np.float64)
+    dates, values = zip(*rows)
+    dates = np.array(dates, dtype=f"datetime64[{DATE_UNITS[granularity]}]")
+    values = np.asarray(values, dtype=np.float64)
+    return dates, values
+
+
+def completion_rate(values):
+    """Средняя доля выполнения за весь период"""
+    return float(values.mean()) if values.size else 0.0
+
+
+def rolling_mean(values, window=ROLLING_WINDOW):
+    """Скользящее среднее через накопленную сумму; первые точки - по неполному окну"""
+    if not values.size:
+        return values
+    sums = np.cumsum(values)
+    result = np.empty_like(values)
+    head = min(window, values.size)
+    result[:head] = sums[:head] / np.arange(1, head + 1)
+    result[head:] = (sums[head:] - sums[:-head]) / window
+    return result
+
+
+def weekdays(dates):
+    """День недели для каждой даты: 0 - понедельник (1970-01-01 был четвергом)"""
+    return (dates.astype("datetime64[D]").astype(np.int64) + 3) % 7
+
+
+def weekday_breakdown(dates, values):
+    """Доля выполнения по дням недели: массив из 7 чисел, пн..вс"""
+    days = weekdays(dates)
+    totals = np.bincount(days, minlength=7)
+    done = np.bincount(days, weights=values, minlength=7)
+    return np.divide(done, totals, out=np.zeros(7), where=totals > 0)
+
+
+def trend(values):
+    """Наклон линейного тренда: изменение доли выполнения за один период"""
+    if values.size < 2:
+        return 0.0
+    return float(np.polyfit(np.arange(values.size), values, 1)[0])
+
+
+def format_labels(dates, granularity):
+    """Подписи оси X для массива дат"""
+    if granularity == "hour":
+        # 'YYYY-MM-DDTHH:MM:SS' -> 'HH:MM:SS'
+        return [text[11:] for text in np.datetime_as_string(dates, unit="s")]
+    texts = np.datetime_as_string(dates, unit="D")
+    if granularity == "month":
+        return [f"{text[5:7]}.{text[:4]}" for text in texts]
+    return [f"{text[8:10]}.{text[5:7]}.{text[:4]}" for text in texts]
+
+
+def build_chart(rows, granularity="day"):
+    """
+    Готовит всё для графика статистики из строк модели.
+    Возвращает словарь с массивами x, heights, rolling и сводкой rate/trend/weekdays.
+    """
+    dates, values = to_arrays(rows, granularity)
+    if granularity == "hour":
+        # По часам рисуем только сами отметки
+        mask = values > 0
+        dates, values = dates[mask], values[mask]
+
+    chart = {
+        "granularity": granularity,
+        "x": np.arange(values.size, dtype=np.float64),
+        "heights": values,
+        "labels": format_labels(dates, granularity),
+        "rolling": None,
+        "rate": completion_rate(values),
+        "trend": 0.0,
+        "weekdays": None,
+    }
+    if granularity != "hour" and values.size > ROLLING_WINDOW:
+        chart["rolling"] = rolling_mean(values)
+        chart["trend"] = trend(values)
+    if granularity == "day" and values.size >= 7:
+        chart["weekdays"] = weekday_breakdown(dates, values)
+    return chart
+
+
+# ========== Тепловая карта (см. StatisticController.plot_heatmap) ==========
+
+def bitmap_days(bitmap, start, end):
+    """Битовое поле HabitBitmap -> int8-массив по дням [start, end] (1 - выполнено)"""
+    days = np.zeros((end - start).days + 1, dtype=np.int8)
+    if bitmap.start_day is None:
+        return days
+    bits = np.unpackbits(np.frombuffer(bitmap.to_blob(), dtype=np.uint8), bitorder="little")
+    offset = (bitmap.start_day - start).days
+    # Пересечение поля с окном [start, end]
+    first = max(offset, 0)
+    last = min(offset + bits.size, days.size)
+    if first < last:
+        days[first:last] = bits[first - offset:last - offset]
+    return days
+
+
+def heatmap_cell(grid_start, day):
+    """(неделя, день недели) ячейки для даты"""
+    return divmod((day - grid_start).days, 7)
+
+
+def build_heatmap(bitmaps, end=None):
+    """
+    Сетка для тепловой карты из одного или нескольких HabitBitmap: массив (недели, 7),
+    в ячейке - сколько привычек выполнено в этот день, дни после end - NaN.
+    Покрывает всю историю, начиная с понедельника недели самого раннего дня.
+    """
+    end = end or date.today()
+    starts = [bitmap.start_day for bitmap in bitmaps if bitmap.start_day is not None]
+    start = min(starts + [end - timedelta(days=HEATMAP_MIN_DAYS)])
+    grid_start = start - timedelta(days=start.weekday())
+
+    days_count = (end - grid_start).days + 1
+    weeks = -(-days_count // 7)
+    counts = np.zeros(weeks * 7, dtype=np.float32)
+    for bitmap in bitmaps:
+        counts[:days_count] += bitmap_days(bitmap, grid_start, end)
+    counts[days_count:] = np.nan
+
+    # Подписи месяцев - у первой недели каждого месяца
+    week_starts = np.datetime64(grid_start, "D") + 7 * np.arange(weeks)
+    months = week_starts.astype("datetime64[M]")
+    first_weeks = np.flatnonzero(np.diff(months.astype(np.int64), prepend=-1))
+    month_ticks = [
+        (float(week), f"{text[5:7]}.{text[:4]}")
+        for week, text in zip(first_weeks, np.datetime_as_string(months[first_weeks]))
+    ]
+
+    return {
+        "grid": counts.reshape(weeks, 7),
+        "grid_start": grid_start,
+        "levels": (0, max(len(bitmaps), 1)),
+        "month_ticks": month_ticks,
+    }
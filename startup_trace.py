@@ -0,0 +1,79 @@
+"""
+Трассировка запуска: сколько времени уходит на импорты, открытие БД,
+создание окон и первую отрисовку.
+
+Модуль импортируется первой строкой main.py, поэтому отсчёт идёт почти
+с самого старта процесса. Метки ставятся всегда (это одна запись в список),
+а отчёт при выходе из приложения выводится только если задана переменная
+окружения HABIT_TRACE_STARTUP:
+    HABIT_TRACE_STARTUP=1            - таблица в консоль
+    HABIT_TRACE_STARTUP=trace.json   - отчёт в JSON-файл
+HABIT_TRACE_EXIT=1 закрывает приложение сразу после первой отрисовки окна
+входа (так запуск меряет tools/check_startup_budget.py).
+"""
+import json
+import os
+import time
+
+TRACE_ENV = "HABIT_TRACE_STARTUP"
+EXIT_ENV = "HABIT_TRACE_EXIT"
+
+_started = time.perf_counter()
+# [(метка, мс от старта)] в порядке появления
+_marks = []
+
+
+def mark(name):
+    """Запоминает момент name (в мс от импорта модуля)"""
+    _marks.append((name, (time.perf_counter() - _started) * 1000))
+
+
+def watch_first_paint(widget, name, callback=None):
+    """Ставит метку name при первой отрисовке widget, затем вызывает callback()"""
+    from PyQt6.QtCore import QObject, QEvent
+
+    class FirstPaintFilter(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Type.Paint:
+                obj.removeEventFilter(self)
+                mark(name)
+                if callback:
+                    callback()
+            return False
+
+    # Родитель - сам виджет, чтобы фильтр не собрал сборщик мусора
+    widget.installEventFilter(FirstPaintFilter(widget))
+
+
+def exit_if_requested():
+    """При HABIT_TRACE_EXIT завершает цикл событий (после первой отрисовки окна входа)"""
+    if os.environ.get(EXIT_ENV):
+        from PyQt6.QtCore import QTimer
+        from PyQt6.QtWidgets import QApplication
+        QTimer.singleShot(0, QApplication.quit)
+
+
+def format_report():
+    """Текстовая таблица: метка, время от старта и шаг от предыдущей метки"""
+    lines = [f"{'этап':<24}{'от старта, мс':>15}{'шаг, мс':>10}"]
+    previous = 0.0
+    for name, ms in _marks:
+        lines.append(f"{name:<24}{ms:>15.1f}{ms - previous:>10.1f}")
+        previous = ms
+    return "\n".join(lines)
+
+
+def report():
+    """Выводит или сохраняет отчёт, если включён HABIT_TRACE_STARTUP"""
+    target = os.environ.get(TRACE_ENV)
+    if not target:
+        return
+
+    if target == "1":
+        print(format_report())
+        return
+    try:
+        with open(target, "w", encoding="utf-8") as file:
+            json.dump({"marks": [[name, round(ms, 3)] for name, ms in _marks]}, file, indent=2)
+    except OSError as e:
+        print(f"Не удалось сохранить отчёт о запуске: {e}")
@@ -0,0 +1,53 @@
+"""
+Бенчмарк: сколько коммитов в секунду выдерживает DataBase.execute_query_and_commit
+со старыми настройками SQLite (rollback-журнал, synchronous=FULL) и с профилем
+по умолчанию (WAL, synchronous=NORMAL).
+
+Запуск из корня проекта:
+    python tools/bench_sqlite_profile.py [кол-во коммитов]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.database import DataBase  # noqa: E402
+
+
+# Так соединение вело себя до появления профиля
+LEGACY_PROFILE = {
+    "journal_mode": "DELETE",
+    "synchronous": "FULL",
+    "temp_store": "DEFAULT",
+}
+
+
+def commits_per_second(profile, commits):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DataBase(os.path.join(tmp_dir, "bench.db"), profile)
+        db.execute_query_and_commit(db.INSERT_USER, ("bench", "hash"))
+        db.execute_query_and_commit(db.INSERT_HABIT_QUERY, (1, "bench", "bench", 1))
+
+        started = time.perf_counter()
+        for _ in range(commits):
+            db.execute_query_and_commit(db.MARK_HABIT_PROGRESS, (1, 1))
+        elapsed = time.perf_counter() - started
+
+        db.close()
+    return commits / elapsed
+
+
+def main():
+    commits = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    before = commits_per_second(LEGACY_PROFILE, commits)
+    after = commits_per_second({}, commits)
+    print(f"Коммитов: {commits}")
+    print(f"До   (DELETE, synchronous=FULL):  {before:10.0f} коммитов/с")
+    print(f"После (WAL, synchronous=NORMAL):  {after:10.0f} коммитов/с")
+    print(f"Ускорение: x{after / before:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Проверка бюджета запуска: запускает main.py без окон (Qt offscreen) на чистой
+базе, дожидается первой отрисовки окна входа и сравнивает отметки
+startup_trace с бюджетом. Код возврата 1, если какой-то этап вышел за бюджет,
+так что скрипт можно ставить в CI.
+
+Запуск из корня проекта:
+    python tools/check_startup_budget.py [кол-во запусков] [множитель бюджета]
+
+Берётся лучший из запусков (по умолчанию 3), чтобы не ловить случайные
+задержки диска. Бюджеты - мс от старта процесса, около трёх замеренных значений,
+так что заметная регрессия уже не пройдёт. На медленной машине (CI) бюджет
+можно поднять множителем, например 2.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT)
+
+from startup_trace import TRACE_ENV, EXIT_ENV  # noqa: E402
+
+
+# Метка -> бюджет в мс от старта.
+# Замерено (лучший из 3 запусков, offscreen): imports ~75-130 мс, login_painted ~115-175 мс
+BUDGETS = {
+    "imports": 250,
+    "login_painted": 400,
+}
+
+# Сколько ждать один запуск, прежде чем считать его зависшим
+RUN_TIMEOUT = 60
+
+
+def run_once():
+    """Один холодный запуск main.py, возвращает {метка: мс}"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        report_path = os.path.join(tmp_dir, "trace.json")
+        env = dict(os.environ)
+        env.update({
+            "QT_QPA_PLATFORM": "offscreen",
+            # Чистая папка данных, чтобы не трогать настоящую базу
+            "HOME": tmp_dir,
+            "LOCALAPPDATA": tmp_dir,
+            TRACE_ENV: report_path,
+            EXIT_ENV: "1",
+        })
+        subprocess.run(
+            [sys.executable, os.path.join(ROOT, "main.py")],
+            cwd=ROOT, env=env, timeout=RUN_TIMEOUT,
+            stdout=subprocess.DEVNULL, check=True,
+        )
+        with open(report_path, encoding="utf-8") as file:
+            return {name: ms for name, ms in json.load(file)["marks"]}
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    scale = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    results = [run_once() for _ in range(runs)]
+
+    failed = False
+    for name, budget in BUDGETS.items():
+        budget *= scale
+        times = [result[name] for result in results if name in result]
+        if not times:
+            print(f"{name:<16} нет отметки в отчёте")
+            failed = True
+            continue
+        best = min(times)
+        status = "OK" if best <= budget else "ПРЕВЫШЕН"
+        failed |= best > budget
+        print(f"{name:<16} {best:8.1f} мс  (бюджет {budget:.0f} мс)  {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Проверка пересчёта серий после удаления старой истории: серия из STREAK_DAYS дней,
+заканчивающаяся вчера, длиннее срока хранения raw_days. После перехода на новый
+день (агрегаты + удаление старых строк habits_progress_monthly) и rebuild_streaks()
+серия должна остаться (STREAK_DAYS, STREAK_DAYS). Код возврата 1, если это не так.
+
+Запуск из корня проекта:
+    python tools/check_streak_rebuild.py
+"""
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.database import DataBase  # noqa: E402
+from model.main_window_model import MainWindowModel  # noqa: E402
+
+
+STREAK_DAYS = 120
+RAW_DAYS = 90
+
+# Выполненный день в истории (обычно такие строки пишет toggle_mark_habit за сегодня)
+INSERT_COMPLETED_DAY = """
+    INSERT INTO habits_progress_monthly (habit_id, date, progress, completed)
+    VALUES (?, ?, 1, 1)
+"""
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DataBase(os.path.join(tmp_dir, "streaks.db"))
+        user_id = db.execute_query_and_commit(db.INSERT_USER, ("streaks", "hash"))
+        model = MainWindowModel(db, user_id, {"raw_days": RAW_DAYS})
+        model.add_habit("habit", "check", 1)
+        habit_id = model.get_habit_id("habit")
+
+        # История: выполненные дни в habits_progress_monthly и в битовом поле
+        today = date.today()
+        days = [today - timedelta(days=offset) for offset in range(1, STREAK_DAYS + 1)]
+        with db.transaction():
+            for day in days:
+                db.execute_query_and_commit(INSERT_COMPLETED_DAY, (habit_id, day.isoformat()))
+                model._set_bitmap_day(habit_id, day)
+
+        model.rebuild_streaks()
+        before = model.get_habit_streak("habit")
+
+        # Переход на новый день: агрегаты и удаление строк старше RAW_DAYS
+        db.execute_query_and_commit(db.RESET_LAST_ROLLUP_DAY, (user_id,))
+        model.apply_retention()
+        kept = db.fetch_all(db.EXPORT_USER_MONTHLY, (user_id,))
+        model.rebuild_streaks()
+        after = model.get_habit_streak("habit")
+        db.close()
+
+    print(f"Серия до удаления истории: {before}, строк истории после: {len(kept)}, серия после пересчёта: {after}")
+    expected = (STREAK_DAYS, STREAK_DAYS)
+    if before != expected or after != expected or len(kept) >= STREAK_DAYS:
+        print(f"ОШИБКА: ожидалось {expected}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Стресс-тест пула соединений DataBase: несколько потоков-писателей отмечают
+привычки (toggle_mark_habit), а потоки-читатели параллельно читают прогресс
+(get_habits_with_progress) и историю курсором (iter_rows).
+
+В конце сверяет счётчики: progress каждой привычки за сегодня (и в
+habits_progress_monthly) должен равняться числу отметок. Код возврата 1,
+если какой-то счётчик потерялся или в потоке было исключение.
+
+Запуск из корня проекта:
+    python tools/stress_db_pool.py [писателей] [читателей] [отметок на писателя]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.database import DataBase  # noqa: E402
+from model.main_window_model import MainWindowModel  # noqa: E402
+
+
+HABITS = 4
+
+
+def writer(model, marks, errors):
+    try:
+        for i in range(marks):
+            model.toggle_mark_habit(f"habit{i % HABITS}")
+    except Exception:
+        errors.append(traceback.format_exc())
+
+
+def reader(model, stop, errors, reads):
+    """Читает, пока писатели не закончат. Прогресс не должен уменьшаться"""
+    last_seen = {}
+    try:
+        while not stop.is_set():
+            for habit in model.get_habits_with_progress():
+                if habit["progress"] < last_seen.get(habit["name"], 0):
+                    errors.append(f"progress {habit['name']} уменьшился: "
+                                  f"{last_seen[habit['name']]} -> {habit['progress']}")
+                last_seen[habit["name"]] = habit["progress"]
+            for _ in model.db.iter_rows(model.db.EXPORT_USER_PROGRESS, (model.user_id,), batch_size=2):
+                pass
+            reads[0] += 1
+    except Exception:
+        errors.append(traceback.format_exc())
+
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    marks = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DataBase(os.path.join(tmp_dir, "stress.db"), {"read_pool_size": readers})
+        user_id = db.execute_query_and_commit(db.INSERT_USER, ("stress", "hash"))
+        # Одна модель на все потоки, как у GUI-потока и фонового потока БД в приложении
+        model = MainWindowModel(db, user_id)
+        for i in range(HABITS):
+            # Цель больше числа отметок, чтобы progress считал все
+            model.add_habit(f"habit{i}", "stress", writers * marks)
+
+        errors = []
+        reads = [0]
+        stop = threading.Event()
+        reader_threads = [
+            threading.Thread(target=reader, args=(model, stop, errors, reads)) for _ in range(readers)
+        ]
+        writer_threads = [
+            threading.Thread(target=writer, args=(model, marks, errors)) for _ in range(writers)
+        ]
+
+        started = time.perf_counter()
+        for thread in reader_threads + writer_threads:
+            thread.start()
+        for thread in writer_threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for thread in reader_threads:
+            thread.join()
+
+        # Сверяем счётчики: каждый писатель отмечает привычки по кругу
+        expected = {f"habit{i}": writers * len(range(i, marks, HABITS)) for i in range(HABITS)}
+        for habit in model.get_habits_with_progress():
+            if habit["progress"] != expected[habit["name"]]:
+                errors.append(f"{habit['name']}: progress {habit['progress']}, ожидалось {expected[habit['name']]}")
+        monthly = {}
+        for row in db.iter_rows(db.EXPORT_USER_MONTHLY, (user_id,)):
+            monthly.setdefault(row["name"], []).append(row["progress"])
+        for name, count in expected.items():
+            if monthly.get(name) != [count]:
+                errors.append(f"{name}: monthly {monthly.get(name)}, ожидалось [{count}]")
+
+        db.close()
+
+    print(f"Писателей: {writers}, читателей: {readers}, отметок: {writers * marks} за {elapsed:.2f} c")
+    print(f"Циклов чтения: {reads[0]}")
+    for error in errors:
+        print(error)
+    if errors:
+        print(f"ОШИБОК: {len(errors)}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLabel, QDateEdit, QPushButton, QHBoxLayout
+from PyQt6.QtCore import QDate
+
+class DateRangeDialog(QDialog):
+    def __init__(self, parent=None, start=None, end=None):
+        super().__init__(parent)
+        self.setWindowTitle("Период статистики")
+        self.setMinimumSize(300, 150)
+
+        layout = QVBoxLayout()
+        today = QDate.currentDate()
+
+        # Начало периода
+        self.start_input = QDateEdit()
+        self.start_input.setCalendarPopup(True)
+        self.start_input.setDisplayFormat("dd.MM.yyyy")
+        self.start_input.setMaximumDate(today)
+        self.start_input.setDate(QDate(start) if start else today.addMonths(-3))
+        layout.addWidget(QLabel("С:"))
+        layout.addWidget(self.start_input)
+
+        # Конец периода
+        self.end_input = QDateEdit()
+        self.end_input.setCalendarPopup(True)
+        self.end_input.setDisplayFormat("dd.MM.yyyy")
+        self.end_input.setMaximumDate(today)
+        self.end_input.setDate(QDate(end) if end else today)
+        layout.addWidget(QLabel("По:"))
+        layout.addWidget(self.end_input)
+
+        # Кнопки
+        btn_layout = QHBoxLayout()
+        self.save_btn = QPushButton("Показать")
+        self.cancel_btn = QPushButton("Отмена")
+        btn_layout.addWidget(self.save_btn)
+        btn_layout.addWidget(self.cancel_btn)
+        layout.addLayout(btn_layout)
+
+        self.setLayout(layout)
+
+        self.cancel_btn.clicked.connect(self.reject)
+        self.save_btn.clicked.connect(self.accept)
+
+    def get_range(self):
+        """Возвращает выбранный период как (date, date)"""
+        return self.start_input.date().toPyDate(), self.end_input.date().toPyDate()